@@ -0,0 +1,233 @@
+import multiprocessing
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from pitch_tracker import PitchTracker
+from spectral_analysis import SpectralAnalyzer
+
+
+HEADER_WRITTEN = 0
+HEADER_SEQUENCE = 1
+HEADER_ROWS = 2
+HEADER_DROPPED = 3
+
+HEADER_SIZE = 4
+
+
+class SharedArrays(object):
+	# Numpy arrays laid out back to back in one shared memory block. The
+	# owner creates the block; another process attaches to it by name with
+	# the same layout of (key, shape, dtype) entries.
+	ALIGNMENT = 64
+
+	def __init__(self, layout, name=None):
+		offsets = []
+		size = 0
+		for key, shape, dtype in layout:
+			offsets.append(size)
+			nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+			size += -(-nbytes // self.ALIGNMENT) * self.ALIGNMENT
+
+		self.__owner = name is None
+		if self.__owner:
+			self.__memory = shared_memory.SharedMemory(create=True, size=size)
+		else:
+			self.__memory = shared_memory.SharedMemory(name=name)
+
+		self.__arrays = {}
+		for (key, shape, dtype), offset in zip(layout, offsets):
+			array = np.ndarray(shape, dtype=dtype, buffer=self.__memory.buf, offset=offset)
+			if self.__owner:
+				array.fill(0)
+			self.__arrays[key] = array
+
+	@property
+	def name(self):
+		return self.__memory.name
+
+	def __getitem__(self, key):
+		return self.__arrays[key]
+
+	def close(self):
+		# The arrays are views of the block and must go before it is closed.
+		self.__arrays = {}
+		self.__memory.close()
+		if self.__owner:
+			self.__memory.unlink()
+
+
+def get_layout(size, channels, ring_frames, rows):
+	bins = size // 2
+	return (
+		('header', (HEADER_SIZE,), np.int64),
+		('samples', (ring_frames, channels), np.float32),
+		('spectrum', (bins,), np.float32),
+		('rows', (rows, bins), np.float32),
+		('pitches', (rows,), np.float32),
+	)
+
+
+class AnalysisWorker(object):
+	# Runs the spectral analysis in a separate process so it does not share
+	# the GIL with the GUI and the audio threads. Captured frames go into a
+	# shared sample ring; the process publishes the latest spectrum and the
+	# new spectrogram rows with their F0 into shared arrays under a sequence
+	# lock, and the GUI only copies them out. Both sides are single
+	# producer/consumer.
+
+	def __init__(self, size=2048, channels=1, ring_frames=None, rows=64, rate=44100):
+		self.__size = size
+		self.__channels = channels
+		self.__ring_frames = ring_frames or 16 * size
+		self.__rows = rows
+
+		self.__layout = get_layout(size, channels, self.__ring_frames, rows)
+		self.__shared = SharedArrays(self.__layout)
+		self.__header = self.__shared['header']
+		self.__samples = self.__shared['samples']
+
+		context = multiprocessing.get_context('spawn')
+		# Released once per analysis block. Unlike Event.set, which waits for
+		# the woken process to acknowledge, a release never blocks the GUI.
+		self.__frames_ready = context.Semaphore(0)
+		self.__stop_event = context.Event()
+		self.__process = context.Process(
+			target=run_analysis,
+			args=(self.__shared.name, self.__layout, size, rate, self.__frames_ready, self.__stop_event),
+			daemon=True
+		)
+
+		self.__written = 0
+		self.__sequence = 0
+		self.__rows_read = 0
+
+	@property
+	def size(self):
+		return self.__size
+
+	@property
+	def dropped_frames(self):
+		return int(self.__header[HEADER_DROPPED])
+
+	def start(self):
+		self.__process.start()
+
+	def is_alive(self):
+		return self.__process.is_alive()
+
+	def write(self, frame):
+		# Never blocks: if the process falls behind by more than the ring,
+		# it skips the frames that were overwritten.
+		frame = frame.reshape(frame.shape[0], self.__channels)[-self.__ring_frames:]
+		start = self.__written % self.__ring_frames
+		head = min(frame.shape[0], self.__ring_frames - start)
+		self.__samples[start:start + head] = frame[:head]
+		self.__samples[:frame.shape[0] - head] = frame[head:]
+
+		# The process only has work once a whole analysis block is in, so it
+		# is not woken for every chunk.
+		blocks = self.__written // self.__size
+		self.__written += frame.shape[0]
+		self.__header[HEADER_WRITTEN] = self.__written
+		if self.__written // self.__size != blocks:
+			self.__frames_ready.release()
+
+	def read(self):
+		# Returns (spectrum, rows, pitches) copied out of the shared arrays,
+		# with the spectrogram rows and their F0 (nan if unvoiced) published
+		# since the last call, or None if nothing new was analysed.
+		spectrum = self.__shared['spectrum']
+		rows = self.__shared['rows']
+		pitches = self.__shared['pitches']
+
+		while True:
+			sequence = int(self.__header[HEADER_SEQUENCE])
+			if sequence == self.__sequence:
+				return None
+			if sequence & 1:
+				# A write in progress; one from a worker that died mid-write
+				# never finishes.
+				if not self.__process.is_alive():
+					return None
+				continue
+
+			rows_written = int(self.__header[HEADER_ROWS])
+			first = max(self.__rows_read, rows_written - self.__rows)
+			indices = np.arange(first, rows_written) % self.__rows
+			new_rows = rows[indices]
+			new_pitches = pitches[indices]
+			new_spectrum = spectrum.copy()
+
+			if int(self.__header[HEADER_SEQUENCE]) == sequence:
+				break
+
+		self.__sequence = sequence
+		self.__rows_read = rows_written
+		return new_spectrum, new_rows, new_pitches
+
+	def close(self):
+		self.__stop_event.set()
+		if self.__process.is_alive():
+			self.__process.join(1)
+			if self.__process.is_alive():
+				self.__process.terminate()
+		self.__header = None
+		self.__samples = None
+		self.__shared.close()
+
+
+def run_analysis(name, layout, size, rate, frames_ready, stop_event):
+	shared = SharedArrays(layout, name)
+	header = shared['header']
+	samples = shared['samples']
+	spectrum = shared['spectrum']
+	rows = shared['rows']
+	pitches = shared['pitches']
+	ring_frames = samples.shape[0]
+
+	pitch_tracker = PitchTracker(rate, size)
+
+	def publish(spectral_frame):
+		f0 = pitch_tracker.update(spectral_frame)
+
+		# Odd sequence numbers mark a write in progress.
+		rows_written = int(header[HEADER_ROWS])
+		header[HEADER_SEQUENCE] += 1
+		spectrum[:] = spectral_frame.mix(spectral_frame.amplitude)
+		rows[rows_written % rows.shape[0]] = spectral_frame.mix(spectral_frame.db)
+		pitches[rows_written % rows.shape[0]] = f0
+		header[HEADER_ROWS] = rows_written + 1
+		header[HEADER_SEQUENCE] += 1
+
+	analyzer = SpectralAnalyzer(size)
+	analyzer.subscribe(publish)
+
+	read = 0
+	try:
+		while not stop_event.is_set():
+			if not frames_ready.acquire(timeout=0.1):
+				continue
+
+			written = int(header[HEADER_WRITTEN])
+			if written - read > ring_frames:
+				header[HEADER_DROPPED] += written - ring_frames - read
+				read = written - ring_frames
+			if written == read:
+				continue
+
+			indices = np.arange(read, written) % ring_frames
+			segment = samples[indices]
+
+			# The GUI may have lapped the ring while the segment was copied.
+			overwritten = int(header[HEADER_WRITTEN]) - ring_frames - read
+			if overwritten > 0:
+				header[HEADER_DROPPED] += overwritten
+				segment = segment[overwritten:]
+			read = written
+
+			analyzer.feed(segment)
+	finally:
+		header = samples = spectrum = rows = pitches = None
+		shared.close()
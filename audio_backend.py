@@ -0,0 +1,502 @@
+import abc
+import collections
+import threading
+import time
+import wave
+
+import numpy as np
+
+import sample_format
+
+from signal_generator import SignalGenerator
+from virtual_source import VirtualSource, CALLBACK_CONTINUE, CALLBACK_COMPLETE
+from virtual_source import INPUT_UNDERFLOW, INPUT_OVERFLOW, OUTPUT_UNDERFLOW, OUTPUT_OVERFLOW
+
+
+BACKEND_PYAUDIO = 'pyaudio'
+BACKEND_NULL = 'null'
+BACKEND_LOOPBACK = 'loopback'
+BACKEND_WAV = 'wav'
+BACKEND_GENERATOR = 'generator'
+
+BACKENDS = (BACKEND_PYAUDIO, BACKEND_NULL, BACKEND_LOOPBACK, BACKEND_WAV, BACKEND_GENERATOR)
+
+
+class AudioBackend(abc.ABC):
+	# Input is callback driven: open_input registers a PortAudio-style
+	# callback(data, frame_count, time_info, status) -> (data, flag) that is
+	# called from the backend's own thread once the input is started. Output is
+	# a blocking write of interleaved samples in the opened format, or, when
+	# open_output is given a callback, pulled from callback(None, ...) once
+	# the output is started. With open_duplex the data returned by the
+	# callback is played back directly.
+	# Xruns are reported through the callback status flags, except for
+	# blocking writes, which are counted in output_underflows.
+
+	@abc.abstractmethod
+	def open_input(self, callback, format_=sample_format.INT16, channels=1, rate=44100, chunk_size=2048):
+		pass
+
+	@abc.abstractmethod
+	def open_duplex(self, callback, format_=sample_format.INT16, channels=1, rate=44100, chunk_size=256):
+		pass
+
+	@abc.abstractmethod
+	def open_output(self, format_=sample_format.INT16, channels=1, rate=44100, callback=None, chunk_size=2048):
+		pass
+
+	@abc.abstractmethod
+	def close_input(self):
+		pass
+
+	@abc.abstractmethod
+	def close_output(self):
+		pass
+
+	@property
+	def output_underflows(self):
+		return 0
+
+	@abc.abstractmethod
+	def start_input(self):
+		pass
+
+	@abc.abstractmethod
+	def stop_input(self):
+		pass
+
+	@abc.abstractmethod
+	def start_output(self):
+		pass
+
+	@abc.abstractmethod
+	def stop_output(self):
+		pass
+
+	@abc.abstractmethod
+	def read(self, frame_count):
+		pass
+
+	@abc.abstractmethod
+	def write(self, data):
+		pass
+
+	@abc.abstractmethod
+	def close(self):
+		pass
+
+
+class PyAudioBackend(AudioBackend):
+	# One PortAudio context serves both streams. It is created by the first
+	# open, since initializing it enumerates every host API and device.
+
+	def __init__(self, input_device=None, output_device=None):
+		import pyaudio
+		self.__pyaudio = pyaudio
+
+		self.__input_device = input_device
+		self.__output_device = output_device
+
+		self.__p = None
+		self.__stream_input = None
+		self.__stream_output = None
+		self.__output_underflows = 0
+
+	@property
+	def output_underflows(self):
+		return self.__output_underflows
+
+	def open_input(self, callback, format_=sample_format.INT16, channels=1, rate=44100, chunk_size=2048):
+		self.__stream_input = self.__get_pyaudio().open(
+			format=format_,
+			channels=channels,
+			rate=rate,
+			input=True,
+			input_device_index=self.__input_device,
+			frames_per_buffer=chunk_size,
+			stream_callback=callback
+		)
+
+	def open_duplex(self, callback, format_=sample_format.INT16, channels=1, rate=44100, chunk_size=256):
+		self.__stream_input = self.__get_pyaudio().open(
+			format=format_,
+			channels=channels,
+			rate=rate,
+			input=True,
+			output=True,
+			input_device_index=self.__input_device,
+			output_device_index=self.__output_device,
+			frames_per_buffer=chunk_size,
+			stream_callback=callback
+		)
+
+	def open_output(self, format_=sample_format.INT16, channels=1, rate=44100, callback=None, chunk_size=2048):
+		options = {}
+		if callback:
+			options = {'frames_per_buffer': chunk_size, 'stream_callback': callback, 'start': False}
+		self.__stream_output = self.__get_pyaudio().open(
+			format=format_,
+			channels=channels,
+			rate=rate,
+			output=True,
+			output_device_index=self.__output_device,
+			**options
+		)
+
+	def close_input(self):
+		if self.__stream_input:
+			self.__stream_input.close()
+		self.__stream_input = None
+
+	def close_output(self):
+		if self.__stream_output:
+			self.__stream_output.close()
+		self.__stream_output = None
+
+	def start_input(self):
+		self.__stream_input.start_stream()
+
+	def stop_input(self):
+		self.__stream_input.stop_stream()
+
+	def start_output(self):
+		self.__stream_output.start_stream()
+
+	def stop_output(self):
+		self.__stream_output.stop_stream()
+
+	def read(self, frame_count):
+		return self.__stream_input.read(frame_count, exception_on_overflow=False)
+
+	def write(self, data):
+		try:
+			self.__stream_output.write(data, exception_on_underflow=True)
+		except IOError:
+			# Raised after the data has been written; only the gap is lost.
+			self.__output_underflows += 1
+
+	def close(self):
+		self.close_input()
+		self.close_output()
+		if self.__p:
+			self.__p.terminate()
+		self.__p = None
+
+	def __get_pyaudio(self):
+		if self.__p is None:
+			self.__p = self.__pyaudio.PyAudio()
+		return self.__p
+
+
+class VirtualBackend(AudioBackend):
+	# Input comes from a chunk source (next_chunk(size) -> float samples, or
+	# None at the end) pumped by a VirtualSource thread. Output is handed to
+	# _write_output; with realtime set, write blocks like a device would.
+
+	def __init__(self, source=None, realtime=True, max_chunks=None):
+		self.__source = source
+		self.__realtime = realtime
+		self.__max_chunks = max_chunks
+		self.__input = None
+		self.__output = None
+
+		self._format = sample_format.INT16
+		self._channels = 1
+		self._rate = 44100
+		self.__input_format = sample_format.INT16
+		self.__input_channels = 1
+
+		self.__output_start = None
+		self.__output_frames = 0
+		self.__output_underflows = 0
+
+	@property
+	def realtime(self):
+		return self.__realtime
+
+	@property
+	def output_underflows(self):
+		return self.__output_underflows
+
+	def open_input(self, callback, format_=sample_format.INT16, channels=1, rate=44100, chunk_size=2048):
+		self.__input = VirtualSource(self.__source, realtime=self.__realtime, max_chunks=self.__max_chunks)
+		self.__input.open(callback, format_, channels, rate, chunk_size)
+		self.__input_format = format_
+		self.__input_channels = channels
+
+	def open_duplex(self, callback, format_=sample_format.INT16, channels=1, rate=44100, chunk_size=256):
+		self.__duplex_callback = callback
+		self.__duplex_width = sample_format.get_format(format_).sample_width * channels
+		self.open_input(self.__play_callback_output, format_, channels, rate, chunk_size)
+
+	def open_output(self, format_=sample_format.INT16, channels=1, rate=44100, callback=None, chunk_size=2048):
+		self._format = format_
+		self._channels = channels
+		self._rate = rate
+
+		if callback:
+			# The output callback is paced by a source of silence it ignores.
+			self.__output_callback = callback
+			self.__output = VirtualSource(Silence(rate), realtime=self.__realtime)
+			self.__output.open(self.__pull_callback_output, format_, channels, rate, chunk_size)
+
+	def close_input(self):
+		if self.__input:
+			self.__input.close()
+		self.__input = None
+
+	def close_output(self):
+		if self.__output:
+			self.__output.close()
+		self.__output = None
+
+	def start_input(self):
+		self.__input.start_stream()
+
+	def stop_input(self):
+		self.__input.stop_stream()
+
+	def wait_input(self, timeout=None):
+		self.__input.wait(timeout)
+
+	def start_output(self):
+		self.__output_start = None
+		self.__output_frames = 0
+		if self.__output:
+			self.__output.start_stream()
+
+	def stop_output(self):
+		if self.__output:
+			self.__output.stop_stream()
+
+	def read(self, frame_count):
+		samples = self.__source.next_chunk(frame_count)
+		if samples is None:
+			return b''
+		if samples.ndim == 1 and self.__input_channels > 1:
+			samples = np.repeat(samples[:, None], self.__input_channels, axis=1)
+		return sample_format.to_bytes(sample_format.from_float(samples, self.__input_format), self.__input_format)
+
+	def write(self, data):
+		frame_width = sample_format.get_format(self._format).sample_width * self._channels
+		frame_count = len(data) // frame_width
+		self._write_output(data, frame_count)
+
+		if self.__realtime:
+			now = time.perf_counter()
+			if self.__output_start is None:
+				self.__output_start = now
+			self.__output_frames += frame_count
+			delay = self.__output_start + self.__output_frames / self._rate - now
+			if delay > 0:
+				time.sleep(delay)
+			elif delay < -0.1:
+				# Underrun: restart the clock instead of bursting to catch up.
+				self.__output_start, self.__output_frames = now, 0
+				self.__output_underflows += 1
+
+	def close(self):
+		if self.__input:
+			self.__input.close()
+		if self.__output:
+			self.__output.close()
+
+	def _write_output(self, data, frame_count):
+		pass
+
+	def __play_callback_output(self, data, frame_count, time_info, status):
+		out_data, flag = self.__duplex_callback(data, frame_count, time_info, status)
+		if out_data is not None:
+			self._write_output(out_data, len(out_data) // self.__duplex_width)
+		return out_data, flag
+
+	def __pull_callback_output(self, data, frame_count, time_info, status):
+		# A late pump means the device side would have run dry.
+		if status & INPUT_OVERFLOW:
+			status = OUTPUT_UNDERFLOW
+		out_data, flag = self.__output_callback(None, frame_count, time_info, status)
+		if out_data is not None:
+			self._write_output(out_data, frame_count)
+		return out_data, flag
+
+
+class Silence(object):
+	def __init__(self, rate=44100):
+		self.rate = rate
+
+	def next_chunk(self, size):
+		return np.zeros(size)
+
+
+class NullBackend(VirtualBackend):
+	def __init__(self, rate=44100, realtime=True, max_chunks=None, source=None):
+		super().__init__(source or Silence(rate), realtime, max_chunks)
+		self.__written_frames = 0
+
+	@property
+	def written_frames(self):
+		return self.__written_frames
+
+	def _write_output(self, data, frame_count):
+		self.__written_frames += frame_count
+
+
+class GeneratorBackend(NullBackend):
+	def __init__(self, generator, realtime=True, max_chunks=None):
+		super().__init__(generator.rate, realtime, max_chunks, source=generator)
+
+
+class WavReader(object):
+	# Chunk source over a WAV file. The last chunk is zero-padded to full
+	# size, like a device buffer; loop restarts the file instead of ending.
+
+	def __init__(self, path, loop=False):
+		self.__path = path
+		self.__wav = wave.open(path, 'rb')
+		self.__loop = loop
+		self.__channels = self.__wav.getnchannels()
+		self.__output_channels = self.__channels
+		self.__format = sample_format.get_format_by_width(self.__wav.getsampwidth())
+		self.rate = self.__wav.getframerate()
+
+	@property
+	def channels(self):
+		return self.__channels
+
+	def set_channels(self, channels):
+		# Multichannel files can be mixed down to mono, and mono chunks are
+		# repeated across channels by VirtualSource; nothing else maps.
+		if channels != self.__channels and 1 not in (channels, self.__channels):
+			raise ValueError('{} has {} channels, the input is opened with {}'.format(self.__path, self.__channels, channels))
+		self.__output_channels = channels
+
+	def next_chunk(self, size):
+		data = self.__wav.readframes(size)
+		if not data:
+			if not self.__loop or not self.__wav.getnframes():
+				return None
+			self.__wav.rewind()
+			data = self.__wav.readframes(size)
+
+		samples = sample_format.to_float(sample_format.from_buffer(data, self.__format), self.__format)
+		samples = samples.reshape(-1, self.__channels)
+		if samples.shape[0] < size:
+			samples = np.concatenate((samples, np.zeros((size - samples.shape[0], self.__channels), dtype=samples.dtype)))
+		if self.__channels == 1:
+			return samples[:, 0]
+		if self.__output_channels == 1:
+			return samples.mean(axis=1)
+		return samples
+
+	def close(self):
+		self.__wav.close()
+
+
+class WavFileBackend(VirtualBackend):
+	# Reads input from input_path (silence without one) and records output to
+	# output_path (discarded without one).
+
+	def __init__(self, input_path=None, output_path=None, rate=44100, realtime=True, loop=False):
+		self.__reader = WavReader(input_path, loop) if input_path else None
+		if self.__reader and self.__reader.rate != rate:
+			# Played at the wrong rate the file would come out at the wrong
+			# speed and pitch.
+			self.__reader.close()
+			raise ValueError('{} is sampled at {} Hz, not {} Hz'.format(input_path, self.__reader.rate, rate))
+		super().__init__(self.__reader or Silence(rate), realtime)
+		self.__output_path = output_path
+		self.__writer = None
+
+	def open_input(self, callback, format_=sample_format.INT16, channels=1, rate=44100, chunk_size=2048):
+		if self.__reader:
+			if self.__reader.rate != rate:
+				raise ValueError('The input file is sampled at {} Hz, the input is opened at {} Hz'.format(self.__reader.rate, rate))
+			self.__reader.set_channels(channels)
+		super().open_input(callback, format_, channels, rate, chunk_size)
+
+	def open_output(self, format_=sample_format.INT16, channels=1, rate=44100, callback=None, chunk_size=2048):
+		super().open_output(format_, channels, rate, callback, chunk_size)
+		if self.__output_path and self.__writer is None:
+			self.__writer = wave.open(self.__output_path, 'wb')
+			self.__writer.setnchannels(channels)
+			self.__writer.setsampwidth(sample_format.get_format(format_).sample_width)
+			self.__writer.setframerate(rate)
+
+	def _write_output(self, data, frame_count):
+		if self.__writer:
+			self.__writer.writeframes(data)
+
+	def close(self):
+		super().close()
+		if self.__reader:
+			self.__reader.close()
+			self.__reader = None
+		if self.__writer:
+			self.__writer.close()
+			self.__writer = None
+
+
+class LoopbackBuffer(object):
+	# Chunk source fed by the backend's own output. Input keeps running on
+	# silence while nothing has been played.
+
+	def __init__(self, rate=44100, max_samples=44100 * 10):
+		self.rate = rate
+		self.__max_samples = max_samples
+		self.__chunks = collections.deque()
+		self.__samples = 0
+		self.__offset = 0
+		self.__lock = threading.Lock()
+
+	def push(self, samples):
+		with self.__lock:
+			self.__chunks.append(samples)
+			self.__samples += samples.shape[0]
+			while self.__samples > self.__max_samples:
+				dropped = self.__chunks.popleft()
+				self.__samples -= dropped.shape[0] - self.__offset
+				self.__offset = 0
+
+	def next_chunk(self, size):
+		chunk = np.zeros(size)
+		filled = 0
+		with self.__lock:
+			while filled < size and self.__chunks:
+				head = self.__chunks[0]
+				count = min(size - filled, head.shape[0] - self.__offset)
+				chunk[filled:filled + count] = head[self.__offset:self.__offset + count]
+				filled += count
+				self.__offset += count
+				self.__samples -= count
+				if self.__offset == head.shape[0]:
+					self.__chunks.popleft()
+					self.__offset = 0
+		return chunk
+
+
+class LoopbackBackend(VirtualBackend):
+	# Whatever is written to the output comes back on the input, mixed down
+	# to mono.
+
+	def __init__(self, rate=44100, realtime=True):
+		self.__buffer = LoopbackBuffer(rate)
+		super().__init__(self.__buffer, realtime)
+
+	def _write_output(self, data, frame_count):
+		samples = sample_format.to_float(sample_format.from_buffer(data, self._format), self._format)
+		samples = samples.reshape(frame_count, self._channels).mean(axis=1)
+		self.__buffer.push(samples)
+
+
+def create_backend(name=BACKEND_PYAUDIO, rate=44100, realtime=True, signal=SignalGenerator.KIND_POLYHARMONIC, input_path=None, output_path=None, loop=False):
+	if name == BACKEND_PYAUDIO:
+		return PyAudioBackend()
+	if name == BACKEND_NULL:
+		return NullBackend(rate, realtime)
+	if name == BACKEND_LOOPBACK:
+		return LoopbackBackend(rate, realtime)
+	if name == BACKEND_WAV:
+		return WavFileBackend(input_path, output_path, rate, realtime, loop)
+	if name == BACKEND_GENERATOR:
+		return GeneratorBackend(SignalGenerator(signal, rate=rate), realtime)
+	raise ValueError('Unknown audio backend: {}'.format(name))
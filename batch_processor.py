@@ -0,0 +1,179 @@
+import argparse
+import os
+import sys
+import time
+import wave
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import utils
+import effect_chain
+import sample_format
+
+from resampler import Resampler
+from effect_chain import VoiceEffectChain, Gain
+from formant_shifter import FormantShifter
+
+
+EFFECT_RESAMPLE = effect_chain.EFFECT_RESAMPLE
+EFFECT_PITCH_SHIFT = effect_chain.EFFECT_PITCH_SHIFT
+
+MODE_CHANGED = 'changed'
+MODE_RECOVERED = 'recovered'
+
+
+class FrequencyTransform(object):
+	def __init__(self, coeff=1.0, effect=EFFECT_RESAMPLE, interpolation=Resampler.MODE_NEAREST, channels=1, chunk_size=2048, rate=44100, gain_db=0.0, formant_ratio=1.0):
+		self.__effect_chain = VoiceEffectChain(chunk_size, channels, rate, coeff=coeff, effect=effect, interpolation=interpolation)
+		self.__effect_chain.get(Gain.NAME).set_gain_db(gain_db)
+		if formant_ratio != 1:
+			self.__effect_chain.get(FormantShifter.NAME).set_ratio(formant_ratio)
+			self.__effect_chain.get(FormantShifter.NAME).set_enabled(True)
+
+	@property
+	def latency(self):
+		return self.__effect_chain.latency
+
+	def __call__(self, frame):
+		# float32 (frames, channels) in, a view of the chain buffer out.
+		size = frame.shape[0]
+		np.copyto(self.__effect_chain.block(size), frame)
+		size = self.__effect_chain.run(size)
+		return self.__effect_chain.buffer[:size]
+
+	def flush(self, chunk_size):
+		# Runs silence through the chain until its delay line has come out.
+		remaining = self.latency
+		while remaining > 0:
+			size = min(chunk_size, remaining)
+			self.__effect_chain.block(size).fill(0)
+			size = self.__effect_chain.run(size)
+			yield self.__effect_chain.buffer[:size]
+			remaining -= size
+
+
+def iter_chunks(reader, chunk_size, format_=sample_format.INT16):
+	channels = reader.getnchannels()
+	samples = np.zeros((chunk_size, channels), dtype=np.float32)
+	while True:
+		data = reader.readframes(chunk_size)
+		if not data:
+			break
+		frame = sample_format.from_buffer(data, format_, channels).reshape((-1, channels))
+		yield sample_format.to_float(frame, format_, out=samples[:frame.shape[0]])
+
+
+def process_file(path, output_dir, mode=MODE_CHANGED, coeff=1.0, effect=EFFECT_RESAMPLE, interpolation=Resampler.MODE_NEAREST, chunk_size=2048, gain_db=0.0, formant_ratio=1.0):
+	start = time.perf_counter()
+
+	stem = os.path.splitext(os.path.basename(path))[0]
+	output_path = os.path.join(output_dir, '{}.{}.wav'.format(stem, mode))
+
+	with wave.open(path, 'rb') as reader:
+		format_ = sample_format.get_format_by_width(reader.getsampwidth())
+		channels = reader.getnchannels()
+		rate = reader.getframerate()
+		input_frames = reader.getnframes()
+
+		transform = FrequencyTransform(coeff, effect, interpolation, channels, chunk_size, rate, gain_db, formant_ratio)
+
+		with wave.open(output_path, 'wb') as writer:
+			writer.setnchannels(channels)
+			writer.setsampwidth(reader.getsampwidth())
+			writer.setframerate(rate)
+
+			def write(frame, skip):
+				# The first latency samples out of the chain are its delay, not
+				# audio, and are dropped so the output lines up with the input.
+				if skip:
+					frame, skip = frame[skip:], max(skip - frame.shape[0], 0)
+				writer.writeframes(sample_format.to_bytes(sample_format.from_float(frame, format_), format_))
+				return skip
+
+			skip = transform.latency
+			for frame in iter_chunks(reader, chunk_size, format_):
+				if mode == MODE_RECOVERED:
+					frame = utils.recover_frame(frame)
+				skip = write(transform(frame), skip)
+			for frame in transform.flush(chunk_size):
+				skip = write(frame, skip)
+
+	elapsed = time.perf_counter() - start
+	duration = input_frames / rate
+	return {
+		'input': path,
+		'output': output_path,
+		'duration': duration,
+		'elapsed': elapsed,
+		'realtime_factor': duration / elapsed if elapsed else float('inf'),
+	}
+
+
+def process_files(paths, output_dir, workers=None, **options):
+	with ProcessPoolExecutor(max_workers=workers) as executor:
+		futures = {executor.submit(process_file, path, output_dir, **options): path for path in paths}
+		for future in as_completed(futures):
+			try:
+				yield future.result(), None
+			except (OSError, EOFError, ValueError, wave.Error) as error:
+				yield {'input': futures[future]}, error
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='Apply VoiceChanger processing to WAV files without audio hardware')
+	parser.add_argument('inputs', nargs='+', help='16, 24 or 32-bit PCM WAV files')
+	parser.add_argument('-o', '--output-dir', required=True, help='directory for processed files')
+	parser.add_argument('-m', '--mode', choices=[MODE_CHANGED, MODE_RECOVERED], default=MODE_CHANGED, help='process the recording as is or after the FFT/IFFT recovery')
+	parser.add_argument('-c', '--coeff', type=float, default=1.0, help='frequency coefficient, as set by the slider')
+	parser.add_argument('-e', '--effect', choices=[EFFECT_RESAMPLE, EFFECT_PITCH_SHIFT], default=EFFECT_RESAMPLE)
+	parser.add_argument('-i', '--interpolation', choices=Resampler.MODES, default=Resampler.MODE_NEAREST)
+	parser.add_argument('-g', '--gain-db', type=float, default=0.0, help='output gain in dB')
+	parser.add_argument('-f', '--formant-ratio', type=float, default=1.0, help='formant shift ratio (1 keeps the formants)')
+	parser.add_argument('--chunk-size', type=int, default=2048)
+	parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: CPU count)')
+	args = parser.parse_args(argv)
+
+	os.makedirs(args.output_dir, exist_ok=True)
+
+	total_duration = 0
+	total_elapsed = 0
+	failed = 0
+	batch_start = time.perf_counter()
+
+	results = process_files(
+		args.inputs,
+		args.output_dir,
+		workers=args.workers,
+		mode=args.mode,
+		coeff=args.coeff,
+		effect=args.effect,
+		interpolation=args.interpolation,
+		chunk_size=args.chunk_size,
+		gain_db=args.gain_db,
+		formant_ratio=args.formant_ratio
+	)
+	for result, error in results:
+		if error:
+			failed += 1
+			print('{}: error: {}: {}'.format(result['input'], type(error).__name__, error), file=sys.stderr)
+			continue
+
+		total_duration += result['duration']
+		total_elapsed += result['elapsed']
+		print('{}: {:.1f} s of audio in {:.2f} s ({:.1f}x realtime) -> {}'.format(
+			result['input'], result['duration'], result['elapsed'], result['realtime_factor'], result['output']
+		))
+
+	wall = time.perf_counter() - batch_start
+	if total_elapsed:
+		print('{} files, {:.1f} s of audio in {:.2f} s wall ({:.1f}x realtime per worker, {:.1f}x overall)'.format(
+			len(args.inputs) - failed, total_duration, wall, total_duration / total_elapsed, total_duration / wall
+		))
+
+	return 1 if failed else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,465 @@
+import argparse
+import os
+import threading
+import time
+import timeit
+
+import numpy as np
+
+from PyQt5.QtCore import QCoreApplication
+
+import effect_chain
+import fft_planner
+import utils
+from resampler import Resampler
+from pitch_shifter import PitchShifter
+from ring_buffer import RingBuffer
+from spectrogram_history import SpectrogramHistory
+from spectral_analysis import SpectralAnalyzer
+from pitch_tracker import PitchTracker
+from signal_generator import SignalGenerator
+from effect_chain import EffectChain, VoiceEffectChain
+from micro_recorder import MicroRecorder
+from audio_backend import GeneratorBackend, NullBackend
+from analysis_worker import AnalysisWorker
+from spectral_storage import SpectralStorage
+from playback_engine import PlaybackEngine
+from output_thread import OutputThread
+
+
+def legacy_change_frequency(frame, frequency_coeff):
+	new_frame = []
+	new_indicies = []
+
+	for ind, item in enumerate(frame):
+		new_indicies.append(ind * frequency_coeff)
+
+	new_indicies = np.asarray(new_indicies)
+	new_indicies = np.rint(new_indicies).astype(int)
+
+	for ind in new_indicies:
+		if ind >= len(frame):
+			break
+		new_frame.append(frame[ind])
+
+	new_frame = np.asarray(new_frame)
+	return new_frame
+
+def legacy_fft_vectorized(frame):
+	frame = np.asarray(frame, dtype=float)
+	N = frame.shape[0]
+
+	N_min = min(N, 32)
+
+	n = np.arange(N_min)
+	k = n[:, None]
+	M = np.exp(-2j * np.pi * n * k / N_min)
+	X = np.dot(M, frame.reshape((N_min, -1)))
+
+	while X.shape[0] < N:
+		X_even = X[:, :int(X.shape[1] / 2)]
+		X_odd = X[:, int(X.shape[1] / 2):]
+		factor = np.exp(-1j * np.pi * np.arange(X.shape[0]) / X.shape[0])[:, None]
+		X = np.vstack([X_even + factor * X_odd,
+					   X_even - factor * X_odd])
+
+	return X.ravel()
+
+def print_timing(name, seconds, repeat, chunk_size, rate, baseline=None):
+	per_chunk = seconds / repeat
+	realtime_factor = (chunk_size / rate) / per_chunk
+	line = '{:<28} {:>10.1f} us/chunk {:>10.1f}x realtime'.format(name, per_chunk * 1e6, realtime_factor)
+	if baseline:
+		line += ' {:>8.1f}x faster'.format(baseline / seconds)
+	print(line)
+
+def benchmark_resampler(chunk_size=2048, rate=44100, repeat=200):
+	frame = (np.random.randn(chunk_size) * 3000).astype('int16')
+	coeffs = [value / 10 for value in range(-10, 101)]
+
+	print('Resampler, chunk_size={}, {} coefficients'.format(chunk_size, len(coeffs)))
+
+	legacy_repeat = max(1, repeat // 20)
+	legacy_seconds = timeit.timeit(
+		lambda: [legacy_change_frequency(frame, coeff) for coeff in coeffs],
+		number=legacy_repeat
+	) / len(coeffs) * repeat / legacy_repeat
+	print_timing('legacy loop', legacy_seconds, repeat, chunk_size, rate)
+
+	for mode in Resampler.MODES:
+		resampler = Resampler(mode)
+		for coeff in coeffs:
+			resampler.resample(frame, coeff)
+
+		seconds = timeit.timeit(
+			lambda: [resampler.resample(frame, coeff) for coeff in coeffs],
+			number=repeat
+		) / len(coeffs)
+		print_timing('resampler ({})'.format(mode), seconds, repeat, chunk_size, rate, legacy_seconds)
+
+def benchmark_pitch_shifter(chunk_size=2048, rate=44100, repeat=200):
+	frame = (np.random.randn(chunk_size) * 3000).astype('int16')
+
+	print('Pitch shifter, chunk_size={}'.format(chunk_size))
+
+	for ratio in (0.5, 1.0, 2.0):
+		pitch_shifter = PitchShifter(ratio=ratio)
+		seconds = timeit.timeit(lambda: pitch_shifter.process(frame), number=repeat)
+		print_timing('pitch shifter (x{})'.format(ratio), seconds, repeat, chunk_size, rate)
+
+def benchmark_effect_chain(chunk_size=256, rate=44100, repeat=400):
+	frame = (np.random.randn(chunk_size) * 0.1).astype(np.float32)
+
+	print('Effect chain, chunk_size={}, eq {}'.format(chunk_size, 'scipy' if effect_chain.get_lfilter() else 'numpy segments'))
+
+	chain = VoiceEffectChain(chunk_size, rate=rate, fft_size=512, coeff=1.5)
+	for effect in chain:
+		effect.set_enabled(True)
+		single = EffectChain(chunk_size, effects=[effect])
+		seconds = timeit.timeit(lambda: single.process(frame), number=repeat)
+		print_timing(effect.NAME, seconds, repeat, chunk_size, rate)
+
+	chain = VoiceEffectChain(chunk_size, rate=rate, fft_size=512, coeff=1.5)
+	for effect in chain:
+		effect.set_enabled(True)
+	seconds = timeit.timeit(lambda: chain.process(frame), number=repeat)
+	print_timing('all effects', seconds, repeat, chunk_size, rate)
+
+def measure_cpu_load(target, duration):
+	stop_event = threading.Event()
+	thread = threading.Thread(target=target, args=(stop_event,))
+
+	wall_start = time.perf_counter()
+	cpu_start = time.process_time()
+	thread.start()
+	time.sleep(duration)
+	stop_event.set()
+	thread.join()
+	cpu = time.process_time() - cpu_start
+	wall = time.perf_counter() - wall_start
+	return 100 * cpu / wall
+
+def benchmark_input_thread(chunk_size=2048, rate=44100, duration=2.0):
+	ring = RingBuffer(chunk_size * 64)
+	frames_event = threading.Event()
+	chunk = np.zeros(chunk_size, dtype='int16')
+
+	def produce(stop_event):
+		while not stop_event.wait(chunk_size / rate):
+			ring.write(chunk)
+			frames_event.set()
+
+	def get_frames():
+		size = ring.available() // chunk_size * chunk_size
+		views = ring.peek(size)
+		ring.consume(size)
+		return views
+
+	def busy_spin(stop_event):
+		while not stop_event.is_set():
+			get_frames()
+			time.sleep(0)
+
+	def event_driven(stop_event):
+		while not stop_event.is_set():
+			if frames_event.wait(0.1):
+				frames_event.clear()
+				get_frames()
+
+	print('InputThread hand-off CPU load, {:.0f} s per case'.format(duration))
+
+	for name, consumer in (('busy spin (legacy)', busy_spin), ('event driven', event_driven)):
+		idle_load = measure_cpu_load(consumer, duration)
+
+		producer_stop = threading.Event()
+		producer = threading.Thread(target=produce, args=(producer_stop,))
+		producer.start()
+		active_load = measure_cpu_load(consumer, duration)
+		producer_stop.set()
+		producer.join()
+
+		print('{:<28} idle {:>6.1f}% CPU   active {:>6.1f}% CPU'.format(name, idle_load, active_load))
+
+def benchmark_fft(sizes=(2048, 1764, 4096), rate=44100, repeat=500):
+	print('FFT planner vs legacy fft_vectorized and numpy.fft')
+
+	for size in sizes:
+		frame = np.random.randn(size)
+		plan = fft_planner.get_plan(size)
+
+		errors = (
+			np.max(np.abs(plan.fft(frame) - np.fft.fft(frame))),
+			np.max(np.abs(plan.rfft(frame) - np.fft.rfft(frame))),
+			np.max(np.abs(plan.irfft(np.fft.rfft(frame)) - frame)),
+		)
+		print('size={}  max abs error vs numpy.fft: fft {:.1e}  rfft {:.1e}  irfft {:.1e}'.format(size, *errors))
+
+		legacy_seconds = None
+		if fft_planner.is_power_of_two(size):
+			legacy_seconds = timeit.timeit(lambda: legacy_fft_vectorized(frame), number=repeat)
+			print_timing('legacy fft_vectorized', legacy_seconds, repeat, size, rate)
+
+		for name, transform in (
+			('planner fft', plan.fft),
+			('planner rfft', plan.rfft),
+			('planner rfft float32', fft_planner.get_plan(size, np.float32).rfft),
+			('numpy.fft.rfft', np.fft.rfft),
+		):
+			seconds = timeit.timeit(lambda: transform(frame), number=repeat)
+			print_timing(name, seconds, repeat, size, rate, legacy_seconds)
+
+def benchmark_spectrogram_history(length=1024, bins=1024, repeat=200):
+	row = np.random.randn(bins)
+
+	print('Spectrogram history, {} rows x {} bins'.format(length, bins))
+
+	image_array = np.zeros((length, bins))
+
+	def legacy_append():
+		rolled = np.roll(image_array, -1, 0)
+		rolled[-1:] = row
+		return rolled
+
+	legacy_seconds = timeit.timeit(legacy_append, number=repeat)
+	print('{:<28} {:>10.1f} us/row'.format('np.roll float64 (legacy)', legacy_seconds / repeat * 1e6))
+
+	for dtype in (np.float64, np.float32):
+		history = SpectrogramHistory(length, bins, dtype=dtype)
+
+		def append():
+			history.append(row)
+			return history.view()
+
+		seconds = timeit.timeit(append, number=repeat)
+		print('{:<28} {:>10.1f} us/row {:>8.1f}x faster {:>8.1f} MB held ({:.1f} MB legacy)'.format(
+			'ring {}'.format(np.dtype(dtype).name), seconds / repeat * 1e6, legacy_seconds / seconds,
+			history.nbytes / 2 ** 20, image_array.nbytes / 2 ** 20
+		))
+
+def benchmark_pipeline(chunk_size=2048, rate=44100, chunks=400):
+	print('Capture -> analysis -> effect -> recovery pipeline, generator backend, {} chunks'.format(chunks))
+
+	for kind in SignalGenerator.KINDS:
+		backend = GeneratorBackend(SignalGenerator(kind, rate=rate), realtime=False, max_chunks=chunks)
+		micro = MicroRecorder(rate=rate, chunk_size=chunk_size, ring_chunks=chunks + 1, backend=backend)
+		analyzer = SpectralAnalyzer(chunk_size)
+		history = SpectrogramHistory(1024, chunk_size // 2)
+		analyzer.subscribe(lambda spectral_frame: history.append(spectral_frame.mix(spectral_frame.db)))
+		resampler = Resampler()
+
+		processed = 0
+		start = time.perf_counter()
+		micro.start()
+		while processed < chunks:
+			micro.wait_frames(0.1)
+			frames = micro.get_frames()
+			for frame in frames:
+				analyzer.analyze(frame)
+				utils.recover_frame(frame)
+				micro.write_frame(resampler.resample(frame, 1.5))
+			processed += len(frames)
+		backend.wait_input()
+		elapsed = time.perf_counter() - start
+		micro.stop()
+
+		if micro.overflow_count:
+			print('{:<28} {} overflows'.format(kind, micro.overflow_count))
+		audio = chunks * chunk_size / rate
+		print('{:<28} {:>8.1f} s of audio in {:.2f} s {:>10.1f}x realtime'.format(kind, audio, elapsed, audio / elapsed))
+
+def benchmark_channels(chunk_size=2048, repeat=100):
+	print('Per-chunk processing cost by channel count and rate, chunk_size={}'.format(chunk_size))
+
+	for rate in (44100, 48000, 96000):
+		for channels in (1, 2):
+			generator = SignalGenerator(rate=rate)
+			frame = np.repeat(generator.next_chunk(chunk_size)[:, None], channels, axis=1).astype(np.float32)
+			analyzer = SpectralAnalyzer(chunk_size)
+			chain = VoiceEffectChain(chunk_size, channels, rate, coeff=1.5)
+
+			def process():
+				analyzer.analyze(frame)
+				utils.recover_frame(frame)
+				chain.process(frame)
+
+			seconds = timeit.timeit(process, number=repeat)
+			print_timing('{} Hz, {} channel(s)'.format(rate, channels), seconds, repeat, chunk_size, rate)
+
+
+def benchmark_analysis_worker(chunk_size=512, size=2048, chunks=400, rate=44100):
+	print('GUI thread CPU cost of spectral analysis, chunk_size={}, analysis size={}, {} CPU(s)'.format(chunk_size, size, os.cpu_count()))
+
+	frame = SignalGenerator().next_chunk(chunk_size).astype(np.float32)[:, None]
+
+	analyzer = SpectralAnalyzer(size)
+	history = SpectrogramHistory(1024, size // 2)
+	analyzer.subscribe(lambda spectral_frame: history.append(spectral_frame.mix(spectral_frame.db)))
+	inline_start = time.thread_time()
+	for _ in range(chunks):
+		analyzer.feed(frame)
+	inline_seconds = time.thread_time() - inline_start
+	print('{:<28} {:>10.1f} us/chunk'.format('inline (legacy)', inline_seconds / chunks * 1e6))
+
+	worker = AnalysisWorker(size, rate=rate)
+	worker.start()
+	worker.write(np.zeros((size, 1), dtype=np.float32))
+	while worker.read() is None:
+		time.sleep(0.001)
+
+	# Paced like a capture device, so every row is analysed and the cost is
+	# not flattered by dropped frames. Only this thread's CPU time counts;
+	# with a single CPU the wall time would include the worker's.
+	rows = 0
+	gui_seconds = 0
+	start = time.perf_counter()
+	for ind in range(chunks):
+		delay = start + ind * chunk_size / rate - time.perf_counter()
+		if delay > 0:
+			time.sleep(delay)
+		gui_start = time.thread_time()
+		worker.write(frame)
+		results = worker.read()
+		gui_seconds += time.thread_time() - gui_start
+		if results is not None:
+			rows += len(results[1])
+	quiet_since = time.perf_counter()
+	while time.perf_counter() - quiet_since < 0.1:
+		results = worker.read()
+		if results is not None:
+			rows += len(results[1])
+			quiet_since = time.perf_counter()
+		time.sleep(0.001)
+	dropped = worker.dropped_frames
+	worker.close()
+
+	print('{:<28} {:>10.1f} us/chunk {:>8.1f}x less   {}/{} rows, {} dropped frames'.format(
+		'worker process', gui_seconds / chunks * 1e6, inline_seconds / gui_seconds, rows, chunks * chunk_size // size, dropped
+	))
+
+def benchmark_spectral_storage(chunk_size=2048, rate=44100, chunks=200):
+	print('Recovered recording storage, {} chunks of {}'.format(chunks, chunk_size))
+
+	for kind in SignalGenerator.KINDS:
+		generator = SignalGenerator(kind, rate=rate)
+		frames = [generator.next_chunk(chunk_size).astype(np.float32)[:, None] for _ in range(chunks)]
+		pcm_nbytes = sum(frame.nbytes for frame in frames)
+		print('{:<28} {:>10.1f} KiB float32 samples'.format(kind, pcm_nbytes / 1024))
+
+		for name, options in (
+				('float16', {}),
+				('threshold -60 dB', {'threshold_db': -60}),
+				('top 256 bins', {'top_k': 256}),
+				('top 64 bins', {'top_k': 64}),
+				('default -60 dB, top 256', {'threshold_db': -60, 'top_k': 256})
+			):
+			storage = SpectralStorage(**options)
+			encode_start = time.perf_counter()
+			storage.extend(frames)
+			encode_seconds = time.perf_counter() - encode_start
+			decode_start = time.perf_counter()
+			for frame in storage:
+				pass
+			decode_seconds = time.perf_counter() - decode_start
+			storage.close()
+
+			print('  {:<26} {:>10.1f} KiB {:>6.1f}x smaller   SNR {:>6.1f} dB   encode {:>6.1f} us   decode {:>6.1f} us/chunk'.format(
+				name,
+				storage.nbytes / 1024,
+				storage.compression_ratio,
+				storage.snr_db,
+				encode_seconds / chunks * 1e6,
+				decode_seconds / chunks * 1e6
+			))
+
+def benchmark_playback(chunk_size=512, rate=44100, chunks=200, busy_seconds=0.05):
+	print('Playback underflows with the main thread busy {:.0f} ms at a time, chunk_size={}'.format(busy_seconds * 1000, chunk_size))
+
+	# PlaybackEngine polls the callback's status from a Qt timer.
+	app = QCoreApplication.instance() or QCoreApplication([])
+	generator = SignalGenerator(rate=rate)
+	frames = [generator.next_chunk(chunk_size).astype(np.float32)[:, None] for _ in range(chunks)]
+
+	def busy(seconds):
+		end = time.perf_counter() + seconds
+		while time.perf_counter() < end:
+			sum(range(1000))
+
+	for prefetch_chunks in (1, 2, 8, 16):
+		micro = MicroRecorder(rate=rate, chunk_size=chunk_size, backend=NullBackend(rate))
+		engine = PlaybackEngine(micro, chunk_size, prefetch_chunks=prefetch_chunks)
+		output_thread = OutputThread(engine, chunk_size=chunk_size, rate=rate)
+		output_thread.set_effect_mode(OutputThread.EFFECT_PITCH_SHIFT)
+		output_thread.set_frequency_coeff(1.5)
+		output_thread.set_frames(frames)
+
+		engine.start()
+		output_thread.start()
+		while engine.playing:
+			busy(busy_seconds)
+			app.processEvents()
+			time.sleep(0.001)
+		engine.stop()
+		output_thread.stop()
+		micro.stop()
+
+		print('{:<28} {:>6} underflows in {} chunks'.format('prefetch {} chunk(s)'.format(prefetch_chunks), engine.underflows, chunks))
+
+def benchmark_pitch_tracker(size=2048, rate=44100, frames=200):
+	print('Pitch tracking on the analysis FFT, analysis size={}'.format(size))
+
+	for fundamental in (110, 220, 440):
+		generator = SignalGenerator(rate=rate, frequencies=(fundamental, 2 * fundamental, 4 * fundamental))
+		analyzer = SpectralAnalyzer(size)
+		tracker = PitchTracker(rate, size)
+		f0s = []
+		analyzer.subscribe(lambda spectral_frame: f0s.append(tracker.update(spectral_frame)))
+		for _ in range(frames):
+			analyzer.analyze(generator.next_chunk(size))
+
+		f0s = np.asarray(f0s)
+		voiced = f0s[np.isfinite(f0s)]
+		cents = np.abs(1200 * np.log2(voiced / fundamental)) if len(voiced) else np.array([np.nan])
+		print('{:<28} {:>9.1f}% voiced {:>8.2f} cents median error'.format(
+			'{} Hz polyharmonic'.format(fundamental), len(voiced) / frames * 100, np.median(cents)
+		))
+
+	generator = SignalGenerator(SignalGenerator.KIND_NOISE, rate=rate)
+	analyzer = SpectralAnalyzer(size)
+	tracker = PitchTracker(rate, size)
+	f0s = [tracker.update(analyzer.analyze(generator.next_chunk(size))) for _ in range(frames)]
+	print('{:<28} {:>9.1f}% voiced'.format('noise', np.isfinite(f0s).sum() / frames * 100))
+
+	frame = SignalGenerator(rate=rate).next_chunk(size)
+	spectral_frame = analyzer.analyze(frame)
+	analysis_seconds = timeit.timeit(lambda: analyzer.analyze(frame), number=frames)
+	tracker_seconds = timeit.timeit(lambda: tracker.update(spectral_frame), number=frames)
+	print_timing('analysis FFT (shared)', analysis_seconds, frames, size, rate)
+	print_timing('pitch tracker', tracker_seconds, frames, size, rate)
+
+BENCHMARKS = {
+	'resampler': benchmark_resampler,
+	'pitch_shifter': benchmark_pitch_shifter,
+	'effect_chain': benchmark_effect_chain,
+	'input_thread': benchmark_input_thread,
+	'fft': benchmark_fft,
+	'spectrogram_history': benchmark_spectrogram_history,
+	'pipeline': benchmark_pipeline,
+	'channels': benchmark_channels,
+	'analysis_worker': benchmark_analysis_worker,
+	'spectral_storage': benchmark_spectral_storage,
+	'playback': benchmark_playback,
+	'pitch_tracker': benchmark_pitch_tracker,
+}
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='VoiceChanger performance benchmarks')
+	parser.add_argument('names', nargs='*', help='benchmarks to run (default: all)')
+	args = parser.parse_args()
+
+	unknown = [name for name in args.names if name not in BENCHMARKS]
+	if unknown:
+		parser.error('unknown benchmarks: {} (choose from {})'.format(', '.join(unknown), ', '.join(BENCHMARKS)))
+
+	for name in args.names or BENCHMARKS:
+		BENCHMARKS[name]()
+		print()
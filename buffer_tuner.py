@@ -0,0 +1,73 @@
+import math
+
+
+class BufferTuner(object):
+	# Picks the chunk size and ring depth from what the last update interval
+	# looked like. Xruns or a busy callback or consumer double the chunk; a
+	# long run of quiet intervals with spare time halves it again, but never
+	# back to a size that has already been too small, so the tuner settles
+	# instead of cycling. Ring overflows or a deep backlog double the time
+	# the ring can hold. The ring depth in chunks follows from that time and
+	# the chunk size.
+
+	def __init__(
+			self,
+			chunk_size=2048,
+			ring_chunks=64,
+			rate=44100,
+			min_chunk_size=128,
+			max_chunk_size=8192,
+			max_ring_seconds=16.0,
+			high_load=0.6,
+			low_load=0.2,
+			stable_updates=5
+		):
+
+		self.__rate = rate
+		self.__min_chunk_size = min_chunk_size
+		self.__max_chunk_size = max_chunk_size
+		self.__max_ring_seconds = max_ring_seconds
+		self.__high_load = high_load
+		self.__low_load = low_load
+		self.__stable_updates = stable_updates
+
+		self.__chunk_size = chunk_size
+		self.__ring_chunks = ring_chunks
+		self.__ring_seconds = chunk_size * ring_chunks / rate
+		self.__stable = 0
+		self.__floor_chunk_size = min_chunk_size
+
+	@property
+	def chunk_size(self):
+		return self.__chunk_size
+
+	@property
+	def ring_chunks(self):
+		return self.__ring_chunks
+
+	def update(self, xruns=0, ring_overflows=0, load=0.0, backlog=0.0):
+		# load is the busier of the callback and the consumer, as time spent
+		# over audio time; backlog is the largest ring fill ratio seen by the
+		# consumer. Returns True if anything changed.
+		chunk_size = self.__chunk_size
+
+		if ring_overflows or backlog > 0.5:
+			self.__ring_seconds = min(2 * self.__ring_seconds, self.__max_ring_seconds)
+
+		if xruns or load > self.__high_load:
+			self.__floor_chunk_size = min(max(self.__floor_chunk_size, 2 * chunk_size), self.__max_chunk_size)
+			chunk_size = min(2 * chunk_size, self.__max_chunk_size)
+			self.__stable = 0
+		elif load < self.__low_load and backlog < 0.25 and not ring_overflows:
+			self.__stable += 1
+			if self.__stable >= self.__stable_updates:
+				chunk_size = max(chunk_size // 2, self.__floor_chunk_size)
+				self.__stable = 0
+		else:
+			self.__stable = 0
+
+		ring_chunks = max(4, int(math.ceil(self.__ring_seconds * self.__rate / chunk_size)))
+
+		changed = (chunk_size, ring_chunks) != (self.__chunk_size, self.__ring_chunks)
+		self.__chunk_size, self.__ring_chunks = chunk_size, ring_chunks
+		return changed
@@ -0,0 +1,434 @@
+import abc
+import math
+
+import numpy as np
+
+from resampler import Resampler
+from pitch_shifter import PitchShifter
+from formant_shifter import FormantShifter
+
+
+EFFECT_RESAMPLE = 'resample'
+EFFECT_PITCH_SHIFT = 'pitch_shift'
+
+_lfilter = None
+
+
+def get_lfilter():
+	# scipy.signal is slow to import and only the EQ needs it, so it is
+	# imported when an EQ is first enabled. None if scipy is missing.
+	global _lfilter
+	if _lfilter is None:
+		try:
+			from scipy.signal import lfilter
+		except ImportError:
+			lfilter = False
+		_lfilter = lfilter
+	return _lfilter or None
+
+
+class Effect(abc.ABC):
+	# Processors work in place on the chain's float32 (frames, channels)
+	# buffer: process() reads block[:size] and returns how many frames it
+	# left there. Parameter setters only replace values, so they can be
+	# called from the UI while the chain is running.
+	NAME = None
+
+	def __init__(self, enabled=True):
+		self.enabled = enabled
+
+	@property
+	def latency(self):
+		return 0
+
+	def set_enabled(self, enabled):
+		self.enabled = enabled
+
+	def prepare(self, capacity, channels):
+		pass
+
+	def reset(self):
+		pass
+
+	@abc.abstractmethod
+	def process(self, block, size):
+		pass
+
+
+class Gain(Effect):
+	NAME = 'gain'
+
+	def __init__(self, gain_db=0.0, enabled=True):
+		super().__init__(enabled)
+		self.set_gain_db(gain_db)
+
+	def set_gain_db(self, gain_db):
+		self.__gain = 10 ** (gain_db / 20)
+
+	def process(self, block, size):
+		if self.__gain != 1:
+			np.multiply(block[:size], self.__gain, out=block[:size])
+		return size
+
+
+class FrequencyChange(Effect):
+	# The original voice changer effect: reads the block at coeff times the
+	# speed, so the result is never longer than the input.
+	NAME = 'frequency'
+
+	def __init__(self, coeff=1.0, interpolation=Resampler.MODE_NEAREST, enabled=True):
+		super().__init__(enabled)
+		self.__coeff = coeff
+		self.__resampler = Resampler(interpolation)
+		self.__scratch = np.zeros((0, 1), dtype=np.float32)
+
+	def set_coeff(self, coeff):
+		self.__coeff = coeff
+
+	def set_interpolation_mode(self, mode):
+		self.__resampler.set_mode(mode)
+
+	def prepare(self, capacity, channels):
+		self.__scratch = np.zeros((capacity, channels), dtype=np.float32)
+
+	def process(self, block, size):
+		if self.__coeff == 1:
+			return size
+		np.copyto(self.__scratch[:size], block[:size])
+		return self.__resampler.resample_into(self.__scratch[:size], self.__coeff, block)
+
+
+class SpectralShift(Effect):
+	# One streaming SpectralShifter per channel; the effect takes the
+	# shifter class's NAME, so the chain holds one of each kind.
+
+	def __init__(self, shifter_class, ratio=1.0, fft_size=2048, enabled=True):
+		super().__init__(enabled)
+		self.NAME = shifter_class.NAME
+		self.__shifter_class = shifter_class
+		self.__ratio = ratio
+		self.__fft_size = fft_size
+		self.__shifters = []
+
+	@property
+	def latency(self):
+		return self.__fft_size
+
+	def set_ratio(self, ratio):
+		self.__ratio = ratio
+		for shifter in self.__shifters:
+			shifter.set_ratio(ratio)
+
+	def prepare(self, capacity, channels):
+		if len(self.__shifters) != channels:
+			self.__shifters = [self.__shifter_class(self.__fft_size, ratio=self.__ratio) for _ in range(channels)]
+
+	def reset(self):
+		for shifter in self.__shifters:
+			shifter.reset()
+
+	def process(self, block, size):
+		for channel, shifter in enumerate(self.__shifters):
+			samples = block[:size, channel]
+			shifter.process_into(samples, samples)
+		return size
+
+
+class BiquadEQ(Effect):
+	# RBJ cookbook biquad in transposed direct form II. Uses scipy's lfilter
+	# when it is installed. Without scipy the block is cut into segments of
+	# SEGMENT frames: the input's part of each segment's output is one matrix
+	# product with the impulse response, and only the two state values are
+	# carried from segment to segment in Python.
+	NAME = 'eq'
+	SEGMENT = 64
+
+	KIND_PEAKING = 'peaking'
+	KIND_LOW_SHELF = 'low_shelf'
+	KIND_HIGH_SHELF = 'high_shelf'
+	KIND_LOW_PASS = 'low_pass'
+	KIND_HIGH_PASS = 'high_pass'
+
+	KINDS = (KIND_PEAKING, KIND_LOW_SHELF, KIND_HIGH_SHELF, KIND_LOW_PASS, KIND_HIGH_PASS)
+
+	def __init__(self, kind=KIND_PEAKING, frequency=1000.0, gain_db=0.0, q=0.707, rate=44100, enabled=True):
+		super().__init__(enabled)
+		self.__rate = rate
+		self.__state = np.zeros((2, 1))
+		self.__lfilter = get_lfilter() if enabled else None
+		self.set_params(kind, frequency, gain_db, q)
+
+	def set_enabled(self, enabled):
+		if enabled:
+			self.__lfilter = get_lfilter()
+		super().set_enabled(enabled)
+
+	def set_params(self, kind=None, frequency=None, gain_db=None, q=None):
+		kind = self.__kind if kind is None else kind
+		if kind not in self.KINDS:
+			raise ValueError('Unknown filter kind: {}'.format(kind))
+
+		self.__kind = kind
+		self.__frequency = self.__frequency if frequency is None else frequency
+		self.__gain_db = self.__gain_db if gain_db is None else gain_db
+		self.__q = self.__q if q is None else q
+		self.__update_filter()
+
+	def set_rate(self, rate):
+		self.__rate = rate
+		self.__update_filter()
+
+	def __update_filter(self):
+		# Published in one assignment, so process() on the audio thread
+		# never mixes old and new coefficients.
+		b, a = self.__coefficients()
+		self.__filter = (b, a, self.__get_segment_matrices(b, a))
+
+	def prepare(self, capacity, channels):
+		if self.__state.shape[1] != channels:
+			self.__state = np.zeros((2, channels))
+
+	def reset(self):
+		self.__state[:] = 0
+
+	def process(self, block, size):
+		b, a, matrices = self.__filter
+		if self.__lfilter is not None:
+			block[:size], self.__state = self.__lfilter(b, a, block[:size], axis=0, zi=self.__state)
+			return size
+
+		impulse, response, powers, drive = matrices
+		segment = self.SEGMENT
+		state = self.__state
+		full = size // segment * segment
+		if full:
+			x = block[:full].reshape(-1, segment, block.shape[1])
+			driven = drive @ x
+			states = np.empty(driven.shape)
+			for ind in range(x.shape[0]):
+				states[ind] = state
+				state = powers[segment] @ state + driven[ind]
+			block[:full] = (impulse @ x + response @ states).reshape(full, block.shape[1])
+		if size > full:
+			rest = size - full
+			x = block[full:size]
+			y = impulse[:rest, :rest] @ x + response[:rest] @ state
+			state = powers[rest] @ state + drive[:, segment - rest:] @ x
+			block[full:size] = y
+		self.__state[:] = state
+		return size
+
+	def __get_segment_matrices(self, b, a):
+		# State space form of the TDF-II recursion, s' = A s + B x and
+		# y = C s + D x with s = (z1, z2), unrolled over one segment.
+		b0, b1, b2 = b
+		_, a1, a2 = a
+		transition = np.array([[-a1, 1.0], [-a2, 0.0]])
+		feed = np.array([b1 - a1 * b0, b2 - a2 * b0])
+
+		segment = self.SEGMENT
+		powers = np.empty((segment + 1, 2, 2))
+		powers[0] = np.eye(2)
+		for ind in range(segment):
+			powers[ind + 1] = transition @ powers[ind]
+
+		# h[0] = D, h[n] = C A^(n-1) B; the impulse matrix is its lower
+		# triangular Toeplitz matrix.
+		taps = np.empty(segment)
+		taps[0] = b0
+		taps[1:] = powers[:-2, 0] @ feed
+		lags = np.arange(segment)[:, None] - np.arange(segment)
+		impulse = np.where(lags >= 0, taps[np.maximum(lags, 0)], 0.0)
+
+		# Row n of response is C A^n; column k of drive is A^(segment-1-k) B.
+		response = powers[:-1, 0].copy()
+		drive = (powers[segment - 1::-1] @ feed).T.copy()
+		return impulse, response, powers, drive
+
+	def __coefficients(self):
+		amplitude = 10 ** (self.__gain_db / 40)
+		omega = 2 * math.pi * min(self.__frequency, 0.49 * self.__rate) / self.__rate
+		cos, sin = math.cos(omega), math.sin(omega)
+		alpha = sin / (2 * self.__q)
+
+		if self.__kind == self.KIND_PEAKING:
+			b = (1 + alpha * amplitude, -2 * cos, 1 - alpha * amplitude)
+			a = (1 + alpha / amplitude, -2 * cos, 1 - alpha / amplitude)
+		elif self.__kind == self.KIND_LOW_PASS:
+			b = ((1 - cos) / 2, 1 - cos, (1 - cos) / 2)
+			a = (1 + alpha, -2 * cos, 1 - alpha)
+		elif self.__kind == self.KIND_HIGH_PASS:
+			b = ((1 + cos) / 2, -(1 + cos), (1 + cos) / 2)
+			a = (1 + alpha, -2 * cos, 1 - alpha)
+		else:
+			sign = 1 if self.__kind == self.KIND_LOW_SHELF else -1
+			root = 2 * math.sqrt(amplitude) * alpha
+			b = (
+				amplitude * ((amplitude + 1) - sign * (amplitude - 1) * cos + root),
+				2 * sign * amplitude * ((amplitude - 1) - sign * (amplitude + 1) * cos),
+				amplitude * ((amplitude + 1) - sign * (amplitude - 1) * cos - root),
+			)
+			a = (
+				(amplitude + 1) + sign * (amplitude - 1) * cos + root,
+				-2 * sign * ((amplitude - 1) + sign * (amplitude + 1) * cos),
+				(amplitude + 1) + sign * (amplitude - 1) * cos - root,
+			)
+
+		return np.asarray(b) / a[0], np.asarray(a) / a[0]
+
+
+class NoiseGate(Effect):
+	# Block-level gate with hysteresis. The gain ramps linearly across each
+	# block to avoid clicks when the gate opens or closes.
+	NAME = 'gate'
+
+	def __init__(self, threshold_db=-50.0, hysteresis_db=6.0, floor_db=-80.0, enabled=True):
+		super().__init__(enabled)
+		self.set_threshold_db(threshold_db, hysteresis_db, floor_db)
+		self.__gain = 1.0
+		self.__open = True
+
+	def set_threshold_db(self, threshold_db, hysteresis_db=6.0, floor_db=-80.0):
+		self.__open_level = 10 ** (threshold_db / 20)
+		self.__close_level = 10 ** ((threshold_db - hysteresis_db) / 20)
+		self.__floor = 10 ** (floor_db / 20)
+
+	def prepare(self, capacity, channels):
+		self.__squares = np.zeros((capacity, channels), dtype=np.float32)
+		self.__steps = np.arange(1, capacity + 1, dtype=np.float32)
+		self.__gains = np.zeros((capacity, 1), dtype=np.float32)
+
+	def reset(self):
+		self.__gain = 1.0
+		self.__open = True
+
+	def process(self, block, size):
+		samples = block[:size]
+		squares = np.multiply(samples, samples, out=self.__squares[:size])
+		level = math.sqrt(float(squares.mean()))
+
+		if self.__open and level < self.__close_level:
+			self.__open = False
+		elif not self.__open and level >= self.__open_level:
+			self.__open = True
+
+		target = 1.0 if self.__open else self.__floor
+		if target == self.__gain == 1.0:
+			return size
+
+		gains = self.__gains[:size, 0]
+		np.multiply(self.__steps[:size], (target - self.__gain) / size, out=gains)
+		gains += self.__gain
+		np.multiply(samples, self.__gains[:size], out=samples)
+		self.__gain = target
+		return size
+
+
+class EffectChain(object):
+	# block() and run() belong to the thread that processes audio, which
+	# may be an audio callback and so never takes a lock. Other threads
+	# change the chain by swapping in a new effects tuple, and a reset is
+	# only requested here and carried out by the next run().
+
+	def __init__(self, block_size=2048, channels=1, effects=()):
+		self.__channels = channels
+		self.__effects = ()
+		self.__reset_pending = False
+		self.__buffer = np.zeros((block_size, channels), dtype=np.float32)
+		for effect in effects:
+			self.append(effect)
+
+	@property
+	def buffer(self):
+		return self.__buffer
+
+	@property
+	def channels(self):
+		return self.__channels
+
+	@property
+	def latency(self):
+		return sum(effect.latency for effect in self.__effects if effect.enabled)
+
+	def __iter__(self):
+		return iter(self.__effects)
+
+	def __len__(self):
+		return len(self.__effects)
+
+	def get(self, name):
+		for effect in self.__effects:
+			if effect.NAME == name:
+				return effect
+		raise KeyError(name)
+
+	def append(self, effect):
+		self.insert(len(self.__effects), effect)
+
+	def insert(self, index, effect):
+		effect.prepare(self.__buffer.shape[0], self.__channels)
+		effects = list(self.__effects)
+		effects.insert(index, effect)
+		self.__effects = tuple(effects)
+
+	def remove(self, effect):
+		effects = list(self.__effects)
+		effects.remove(effect)
+		self.__effects = tuple(effects)
+
+	def reset(self):
+		self.__reset_pending = True
+
+	def block(self, size):
+		# Input view to fill before run(); grows the buffer for longer frames.
+		if size > self.__buffer.shape[0]:
+			self.__buffer = np.zeros((size, self.__channels), dtype=np.float32)
+			for effect in self.__effects:
+				effect.prepare(size, self.__channels)
+		return self.__buffer[:size]
+
+	def run(self, size):
+		effects = self.__effects
+		if self.__reset_pending:
+			self.__reset_pending = False
+			for effect in effects:
+				effect.reset()
+		for effect in effects:
+			if effect.enabled:
+				size = effect.process(self.__buffer, size)
+		return size
+
+	def process(self, frame):
+		frame = np.asarray(frame)
+		np.copyto(self.block(frame.shape[0]), frame.reshape((frame.shape[0], -1)), casting='unsafe')
+		size = self.run(frame.shape[0])
+		return self.__buffer[:size, 0] if frame.ndim == 1 else self.__buffer[:size]
+
+
+class VoiceEffectChain(EffectChain):
+	# gate -> eq -> frequency change or pitch shift -> formant -> gain, with
+	# everything but the frequency change switched off.
+
+	def __init__(self, block_size=2048, channels=1, rate=44100, fft_size=2048, coeff=1.0, effect=EFFECT_RESAMPLE, interpolation=Resampler.MODE_NEAREST):
+		super().__init__(block_size, channels, (
+			NoiseGate(enabled=False),
+			BiquadEQ(rate=rate, enabled=False),
+			FrequencyChange(coeff, interpolation),
+			SpectralShift(PitchShifter, max(abs(coeff), PitchShifter.MIN_RATIO), fft_size, enabled=False),
+			SpectralShift(FormantShifter, fft_size=1024, enabled=False),
+			Gain(),
+		))
+		self.set_effect_mode(effect)
+
+	def set_frequency_coeff(self, coeff):
+		self.get(FrequencyChange.NAME).set_coeff(coeff)
+		self.get(PitchShifter.NAME).set_ratio(max(abs(coeff), PitchShifter.MIN_RATIO))
+
+	def set_effect_mode(self, mode):
+		if mode not in (EFFECT_RESAMPLE, EFFECT_PITCH_SHIFT):
+			raise ValueError('Unknown effect mode: {}'.format(mode))
+		self.get(FrequencyChange.NAME).set_enabled(mode == EFFECT_RESAMPLE)
+		self.get(PitchShifter.NAME).set_enabled(mode == EFFECT_PITCH_SHIFT)
+
+	def set_interpolation_mode(self, mode):
+		self.get(FrequencyChange.NAME).set_interpolation_mode(mode)
@@ -0,0 +1,154 @@
+import numpy as np
+
+
+_plans = {}
+
+
+def get_plan(size, dtype=np.float64):
+	key = (size, np.dtype(dtype))
+	plan = _plans.get(key)
+	if plan is None:
+		plan = FFTPlan(size, dtype)
+		_plans[key] = plan
+	return plan
+
+
+def is_power_of_two(size):
+	return size > 0 and size & (size - 1) == 0
+
+
+def next_power_of_two(size):
+	return 1 << (size - 1).bit_length()
+
+
+class FFTPlan(object):
+	# Transforms run along axis 0, so (size,) and (size, channels) inputs are
+	# both supported.
+	# Pure numpy, so it replaces the old fft_vectorized; numpy.fft's compiled
+	# pocketfft is still ~10x faster and stays in the per-hop hot paths.
+
+	def __init__(self, size, dtype=np.float64):
+		self.__size = size
+		self.__real_dtype = np.dtype(dtype)
+		self.__complex_dtype = np.result_type(self.__real_dtype, np.complex64)
+
+		if is_power_of_two(size):
+			self.__init_radix2()
+			self.__complex_fft = self.__radix2_fft
+		else:
+			self.__init_bluestein()
+			self.__complex_fft = self.__bluestein_fft
+
+		self.__half_plan = None
+		if size % 2 == 0 and size > 1:
+			self.__half_plan = get_plan(size // 2, dtype)
+			k = np.arange(size // 2 + 1)
+			self.__real_twiddles = np.exp(-2j * np.pi * k / size).astype(self.__complex_dtype)[:, None]
+
+	@property
+	def size(self):
+		return self.__size
+
+	@property
+	def dtype(self):
+		return self.__real_dtype
+
+	def fft(self, frame):
+		frame, shape = self.__as_columns(frame, self.__complex_dtype, self.__size)
+		return self.__complex_fft(frame).reshape(shape)
+
+	def ifft(self, spectrum):
+		spectrum, shape = self.__as_columns(spectrum, self.__complex_dtype, self.__size)
+		frame = np.conj(self.__complex_fft(np.conj(spectrum))) / self.__size
+		return frame.reshape(shape)
+
+	def rfft(self, frame):
+		frame, shape = self.__as_columns(frame, self.__real_dtype, self.__size)
+		bins = self.__size // 2 + 1
+		shape = (bins,) + shape[1:]
+
+		if self.__half_plan is None:
+			return self.__complex_fft(frame.astype(self.__complex_dtype))[:bins].reshape(shape)
+
+		half = self.__half_plan.fft(frame[0::2] + 1j * frame[1::2])
+		half = np.concatenate([half, half[:1]])
+		mirrored = np.conj(half[::-1])
+
+		even = (half + mirrored) / 2
+		odd = (half - mirrored) / 2j
+		return (even + self.__real_twiddles * odd).reshape(shape)
+
+	def irfft(self, spectrum):
+		spectrum, shape = self.__as_columns(spectrum, self.__complex_dtype, self.__size // 2 + 1)
+		shape = (self.__size,) + shape[1:]
+
+		if self.__half_plan is None:
+			bins = self.__size // 2 + 1
+			full = np.concatenate([spectrum, np.conj(spectrum[bins - 1:0:-1])])
+			frame = np.conj(self.__complex_fft(np.conj(full))).real / self.__size
+			return frame.astype(self.__real_dtype).reshape(shape)
+
+		mirrored = np.conj(spectrum[::-1])
+		even = (spectrum + mirrored) / 2
+		odd = (spectrum - mirrored) / 2 * np.conj(self.__real_twiddles)
+		half = self.__half_plan.ifft((even + 1j * odd)[:-1])
+
+		frame = np.empty((self.__size, half.shape[1]), dtype=self.__real_dtype)
+		frame[0::2] = half.real
+		frame[1::2] = half.imag
+		return frame.reshape(shape)
+
+	def __as_columns(self, frame, dtype, length):
+		frame = np.asarray(frame, dtype=dtype)
+		if frame.shape[0] != length:
+			raise ValueError('Plan of size {} expects {} rows, got {}'.format(self.__size, length, frame.shape[0]))
+		return frame.reshape((length, -1)), frame.shape
+
+	def __init_radix2(self):
+		size = self.__size
+		self.__size_min = min(size, 32)
+
+		n = np.arange(self.__size_min)
+		k = n[:, None]
+		self.__dft_matrix = np.exp(-2j * np.pi * n * k / self.__size_min).astype(self.__complex_dtype)
+
+		self.__factors = []
+		length = self.__size_min
+		while length < size:
+			factor = np.exp(-1j * np.pi * np.arange(length) / length).astype(self.__complex_dtype)
+			self.__factors.append(factor[:, None, None])
+			length *= 2
+
+	def __radix2_fft(self, frame):
+		columns = frame.shape[1]
+		spectrum = np.dot(self.__dft_matrix, frame.reshape((self.__size_min, -1)))
+		spectrum = spectrum.reshape((self.__size_min, -1, columns))
+
+		for factor in self.__factors:
+			half = spectrum.shape[1] // 2
+			spectrum_odd = factor * spectrum[:, half:]
+			combined = np.empty((2 * spectrum.shape[0], half, columns), dtype=spectrum.dtype)
+			np.add(spectrum[:, :half], spectrum_odd, out=combined[:spectrum.shape[0]])
+			np.subtract(spectrum[:, :half], spectrum_odd, out=combined[spectrum.shape[0]:])
+			spectrum = combined
+
+		return spectrum.reshape((self.__size, columns))
+
+	def __init_bluestein(self):
+		size = self.__size
+		self.__padded_size = next_power_of_two(2 * size - 1)
+		self.__padded_plan = get_plan(self.__padded_size, self.__real_dtype)
+
+		n = np.arange(size)
+		self.__chirp = np.exp(-1j * np.pi * ((n * n) % (2 * size)) / size).astype(self.__complex_dtype)[:, None]
+
+		kernel = np.zeros(self.__padded_size, dtype=self.__complex_dtype)
+		kernel[:size] = np.conj(self.__chirp[:, 0])
+		kernel[self.__padded_size - size + 1:] = np.conj(self.__chirp[:0:-1, 0])
+		self.__kernel_spectrum = self.__padded_plan.fft(kernel)[:, None]
+
+	def __bluestein_fft(self, frame):
+		padded = np.zeros((self.__padded_size, frame.shape[1]), dtype=self.__complex_dtype)
+		padded[:self.__size] = frame * self.__chirp
+		convolved = self.__padded_plan.ifft(self.__padded_plan.fft(padded) * self.__kernel_spectrum)
+		return convolved[:self.__size] * self.__chirp
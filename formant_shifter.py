@@ -0,0 +1,40 @@
+import numpy as np
+
+from spectral_shifter import SpectralShifter
+
+
+class FormantShifter(SpectralShifter):
+	# Moves the spectral envelope (cepstrally smoothed log magnitude) by ratio
+	# while keeping the harmonics, so the voice changes character without
+	# changing pitch.
+	NAME = 'formant'
+	MIN_RATIO = 0.25
+	MAX_RATIO = 4.0
+
+	def __init__(self, fft_size=1024, oversampling=4, ratio=1.0, cepstrum_size=30):
+		super().__init__(fft_size, oversampling)
+		self.__cepstrum_size = cepstrum_size
+
+		self.__bins = np.arange(fft_size // 2 + 1, dtype=float)
+		self.__lifter = np.zeros(fft_size)
+		self.__lifter[:cepstrum_size] = 1
+		self.__lifter[fft_size - cepstrum_size + 1:] = 1
+
+		self.set_ratio(ratio)
+
+	def set_ratio(self, ratio):
+		if ratio <= 0:
+			raise ValueError('Formant ratio must be positive, got {}'.format(ratio))
+		ratio = min(max(ratio, self.MIN_RATIO), self.MAX_RATIO)
+		self.__source_bins = self.__bins / ratio
+
+	def __envelope(self, magnitudes):
+		cepstrum = np.fft.irfft(np.log(magnitudes + 1e-9), self.fft_size)
+		return np.fft.rfft(cepstrum * self.__lifter).real
+
+	def shift(self, spectrum):
+		envelope = self.__envelope(np.abs(spectrum))
+		warped = np.interp(self.__source_bins, self.__bins, envelope)
+
+		spectrum *= np.exp(warped - envelope)
+		return spectrum
@@ -1,23 +1,38 @@
 from PyQt5.QtCore import QThread, pyqtSignal
 
-import time
+import latency_monitor
 
 
 class InputThread(QThread):
-	recv_signal = pyqtSignal(list)
+	recv_signal = pyqtSignal(list, float)
 	error_signal = pyqtSignal(str, str)
 
-	def __init__(self, micro=None):
+	def __init__(self, micro=None, wait_timeout=0.1):
 		super().__init__()
 		self.__micro = micro
+		self.__wait_timeout = wait_timeout
+		self.__running = False
 
 	def run(self):
+		self.__running = True
 		if self.__micro:
-			while True:
+			while self.__running:
+				if not self.__micro.wait_frames(self.__wait_timeout):
+					continue
 				frames = self.__micro.get_frames()
-				if frames:
-					self.recv_signal.emit(frames)
-				time.sleep(0)
+				if frames and self.__running:
+					capture_times = self.__micro.get_capture_times()
+					capture_time = capture_times[-1] if len(capture_times) else latency_monitor.now()
+					self.recv_signal.emit(frames, float(capture_time))
+
+	def stop(self):
+		self.__running = False
+		if self.__micro:
+			self.__micro.wake()
+		self.wait()
+
+	def quit(self):
+		self.stop()
 
 	def __send_error_message(self, title, message):
 		self.error_signal.emit(title, message)
@@ -0,0 +1,117 @@
+import csv
+import json
+import math
+import time
+
+
+def now():
+	return time.perf_counter()
+
+
+class LatencyHistogram(object):
+	# Fixed log-spaced buckets from min_value to max_value seconds: recording is
+	# a couple of float operations and a list increment, with no allocation.
+
+	def __init__(self, min_value=1e-6, max_value=10.0, buckets_per_decade=20):
+		self.__log_min = math.log10(min_value)
+		self.__buckets_per_decade = buckets_per_decade
+		self.__size = int(round((math.log10(max_value) - self.__log_min) * buckets_per_decade)) + 1
+		self.reset()
+
+	def reset(self):
+		self.__counts = [0] * self.__size
+		self.__count = 0
+		self.__total = 0.0
+		self.__min = math.inf
+		self.__max = 0.0
+
+	@property
+	def count(self):
+		return self.__count
+
+	def record(self, seconds):
+		if seconds <= 0:
+			ind = 0
+		else:
+			ind = int((math.log10(seconds) - self.__log_min) * self.__buckets_per_decade)
+			ind = min(max(ind, 0), self.__size - 1)
+		self.__counts[ind] += 1
+		self.__count += 1
+		self.__total += seconds
+		if seconds < self.__min:
+			self.__min = seconds
+		if seconds > self.__max:
+			self.__max = seconds
+
+	def percentile(self, percent):
+		if not self.__count:
+			return 0.0
+		target = self.__count * percent / 100
+		cumulative = 0
+		for ind, count in enumerate(self.__counts):
+			cumulative += count
+			if cumulative >= target:
+				upper = 10 ** (self.__log_min + (ind + 1) / self.__buckets_per_decade)
+				return min(upper, self.__max)
+		return self.__max
+
+	def summary(self):
+		return {
+			'count': self.__count,
+			'mean': self.__total / self.__count if self.__count else 0.0,
+			'min': self.__min if self.__count else 0.0,
+			'max': self.__max,
+			'p50': self.percentile(50),
+			'p99': self.percentile(99),
+		}
+
+
+class LatencyMonitor(object):
+	# capture, ring, dispatch and capture_to_render are measured from the ADC
+	# time of the chunk; the remaining stages are per-call durations.
+	# playback_write is the time the output callback takes to fill and
+	# convert one device buffer.
+	STAGE_CAPTURE = 'capture'
+	STAGE_RING = 'ring'
+	STAGE_DISPATCH = 'dispatch'
+	STAGE_ANALYSIS = 'analysis'
+	STAGE_RENDER = 'render'
+	STAGE_CAPTURE_TO_RENDER = 'capture_to_render'
+	STAGE_PROCESS = 'process'
+	STAGE_PLAYBACK_WRITE = 'playback_write'
+
+	FIELDS = ('stage', 'count', 'mean', 'min', 'max', 'p50', 'p99')
+
+	def __init__(self, enabled=True):
+		self.enabled = enabled
+		self.__histograms = {}
+
+	def record(self, stage, seconds):
+		if not self.enabled:
+			return
+		histogram = self.__histograms.get(stage)
+		if histogram is None:
+			histogram = self.__histograms.setdefault(stage, LatencyHistogram())
+		histogram.record(seconds)
+
+	def record_since(self, stage, start):
+		if self.enabled:
+			self.record(stage, now() - start)
+
+	def reset(self):
+		for histogram in self.__histograms.values():
+			histogram.reset()
+
+	def report(self):
+		return {stage: histogram.summary() for stage, histogram in sorted(self.__histograms.items())}
+
+	def export_json(self, path):
+		with open(path, 'w') as output:
+			json.dump(self.report(), output, indent=2)
+
+	def export_csv(self, path):
+		with open(path, 'w', newline='') as output:
+			writer = csv.writer(output)
+			writer.writerow(self.FIELDS)
+			for stage, summary in self.report().items():
+				writer.writerow([stage] + [summary[field] for field in self.FIELDS[1:]])
@@ -0,0 +1,82 @@
+from PyQt5 import QtCore, QtWidgets
+
+
+class LatencyPanel(QtWidgets.QWidget):
+	COLUMNS = ('Stage', 'Count', 'p50, ms', 'p99, ms', 'Mean, ms', 'Max, ms')
+
+	def __init__(self, monitor, counters=None, refresh_interval=500, parent=None):
+		super().__init__(parent)
+		self.__monitor = monitor
+		self.__counters = counters
+
+		self.setWindowTitle('Latency')
+		self.resize(560, 320)
+
+		self.__table = QtWidgets.QTableWidget(0, len(self.COLUMNS))
+		self.__table.setHorizontalHeaderLabels(self.COLUMNS)
+		self.__table.verticalHeader().setVisible(False)
+		self.__table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+		self.__table.horizontalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
+
+		pb_export_json = QtWidgets.QPushButton('Export JSON')
+		pb_export_json.clicked.connect(lambda: self.__export('JSON (*.json)', self.__monitor.export_json))
+		pb_export_csv = QtWidgets.QPushButton('Export CSV')
+		pb_export_csv.clicked.connect(lambda: self.__export('CSV (*.csv)', self.__monitor.export_csv))
+		pb_reset = QtWidgets.QPushButton('Reset')
+		pb_reset.clicked.connect(self.__reset)
+
+		buttons = QtWidgets.QHBoxLayout()
+		buttons.addWidget(pb_export_json)
+		buttons.addWidget(pb_export_csv)
+		buttons.addStretch()
+		buttons.addWidget(pb_reset)
+
+		self.__counters_label = QtWidgets.QLabel()
+		self.__counters_label.setVisible(counters is not None)
+
+		layout = QtWidgets.QVBoxLayout(self)
+		layout.addWidget(self.__table)
+		layout.addWidget(self.__counters_label)
+		layout.addLayout(buttons)
+
+		self.__timer = QtCore.QTimer(self)
+		self.__timer.timeout.connect(self.refresh)
+		self.__refresh_interval = refresh_interval
+
+	def showEvent(self, event):
+		self.refresh()
+		self.__timer.start(self.__refresh_interval)
+		super().showEvent(event)
+
+	def hideEvent(self, event):
+		self.__timer.stop()
+		super().hideEvent(event)
+
+	def refresh(self):
+		report = self.__monitor.report()
+		self.__table.setRowCount(len(report))
+		for row, (stage, summary) in enumerate(report.items()):
+			values = (
+				stage,
+				str(summary['count']),
+				'{:.2f}'.format(summary['p50'] * 1000),
+				'{:.2f}'.format(summary['p99'] * 1000),
+				'{:.2f}'.format(summary['mean'] * 1000),
+				'{:.2f}'.format(summary['max'] * 1000),
+			)
+			for column, value in enumerate(values):
+				self.__table.setItem(row, column, QtWidgets.QTableWidgetItem(value))
+
+		if self.__counters:
+			self.__counters_label.setText(', '.join(
+				'{}: {}'.format(name.replace('_', ' '), value) for name, value in self.__counters().items()
+			))
+
+	def __reset(self):
+		self.__monitor.reset()
+		self.refresh()
+
+	def __export(self, file_filter, export):
+		path, _ = QtWidgets.QFileDialog.getSaveFileName(self, 'Export latency report', '', file_filter)
+		if path:
+			export(path)
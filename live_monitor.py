@@ -0,0 +1,74 @@
+import numpy as np
+
+import sample_format
+
+from effect_chain import VoiceEffectChain, EFFECT_PITCH_SHIFT
+
+
+class LiveMonitor(object):
+	# Runs the effect chain inside the duplex audio callback. The monitor's
+	# buffers and the shifters' scratch arrays are allocated up front and
+	# process() hands back a read-only view of the output samples, but each
+	# pitch shifter hop still gets its two transforms as new arrays from
+	# numpy.fft. The frequency is always changed by pitch shifting:
+	# resampling up shortens each block, and in real time there is nothing
+	# to fill the gap with but silence.
+
+	def __init__(self, chunk_size=256, channels=1, format_=sample_format.INT16, rate=44100, fft_size=512):
+		self.__channels = channels
+		self.__format = format_
+
+		self.__enabled = False
+		self.__effect_chain = VoiceEffectChain(chunk_size, channels, rate, fft_size, effect=EFFECT_PITCH_SHIFT)
+		self.set_chunk_size(chunk_size)
+
+	@property
+	def enabled(self):
+		return self.__enabled
+
+	@property
+	def effect_chain(self):
+		return self.__effect_chain
+
+	@property
+	def latency(self):
+		# Algorithmic latency in frames, on top of the device buffers.
+		return self.__effect_chain.latency
+
+	def set_chunk_size(self, chunk_size):
+		# Only called while the stream is closed.
+		self.__chunk_size = chunk_size
+		self.__samples = np.zeros((chunk_size, self.__channels), dtype=sample_format.get_format(self.__format).dtype)
+
+		width = sample_format.get_format(self.__format).sample_width * self.__channels
+		self.__silence = memoryview(bytes(chunk_size * width))
+		if self.__format == sample_format.INT24:
+			# Packed 24-bit output cannot be a view of the int32 samples.
+			self.__output_bytes = None
+		else:
+			self.__output_bytes = memoryview(self.__samples.reshape(-1).view(np.uint8)).toreadonly()
+
+	def set_enabled(self, enabled):
+		if enabled and not self.__enabled:
+			self.__effect_chain.reset()
+		self.__enabled = enabled
+
+	def set_frequency_coeff(self, coeff):
+		self.__effect_chain.set_frequency_coeff(coeff)
+
+	def process(self, data):
+		if not self.__enabled:
+			return self.__silence
+
+		samples = sample_format.from_buffer(data, self.__format, self.__channels)
+		if samples.shape[0] * self.__channels != self.__samples.size:
+			return self.__silence
+
+		block = self.__effect_chain.block(self.__chunk_size)
+		sample_format.to_float(samples.reshape(block.shape), self.__format, out=block)
+		self.__effect_chain.run(self.__chunk_size)
+
+		sample_format.from_float(block, self.__format, out=self.__samples)
+		if self.__output_bytes is None:
+			return sample_format.to_bytes(self.__samples, self.__format)
+		return self.__output_bytes
@@ -1,64 +1,256 @@
-import pyaudio
-import threading
 import atexit
+import threading
+
 import numpy as np
 
+import sample_format
+import latency_monitor
+
+from audio_backend import PyAudioBackend, CALLBACK_CONTINUE, CALLBACK_COMPLETE
+from audio_backend import INPUT_UNDERFLOW, INPUT_OVERFLOW, OUTPUT_UNDERFLOW, OUTPUT_OVERFLOW
+from ring_buffer import RingBuffer
+from live_monitor import LiveMonitor
+
 
 class MicroRecorder(object):
-	def __init__(self, format_=pyaudio.paInt16, channels=1, rate=44100, chunk_size=2048):
+	# Samples are converted to float32 in the input callback and back to the
+	# device format in write_frame; frames in between are (chunk_size,
+	# channels) float32 arrays. Streams are opened on first use.
+
+	def __init__(self, format_=sample_format.INT16, channels=1, rate=44100, chunk_size=2048, ring_chunks=64, monitor=None, backend=None, duplex=False):
 		self.__format = format_
 		self.__channels = channels
 		self.__rate = rate
-		self.__chunk_size = chunk_size
+		self.__monitor = monitor
+		self.__duplex = duplex
+
+		self.__frames_event = threading.Event()
+		self.__buffers_lock = threading.Lock()
+		self.__captured_before = 0
+		self.__init_buffers(chunk_size, ring_chunks)
 
-		self.__frames = []
+		self.__input_overflows = 0
+		self.__input_underflows = 0
+		self.__output_underflows = 0
+		self.__output_overflows = 0
+		self.__tuned_xruns = 0
+		self.__tuned_ring_overflows = 0
+		self.__reset_load()
 
-		self.__lock = threading.Lock()
 		self.__stop = False
+		self.__input_running = False
 
 		atexit.register(self.__close)
 
-		self.__p_input, self.__stream_input = self.__init_pyaudio_input()
-		self.__p_output, self.__stream_output = self.__init_pyaudio_output()
-
-	def __init_pyaudio_input(self):
-		self.__p_input = pyaudio.PyAudio()
-		self.__stream_input = self.__p_input.open(
-			format=self.__format,
-			channels=self.__channels,
-			rate=self.__rate,
-			input=True,
-			frames_per_buffer=self.__chunk_size,
-			stream_callback=self.recv_frame_callback
-		)
-		return self.__p_input, self.__stream_input
-
-	def __init_pyaudio_output(self):
-		self.__p_output = pyaudio.PyAudio()
-		self.__stream_output = self.__p_output.open(
-			format=self.__format,
-			channels=self.__channels,
-			rate=self.__rate,
-			output=True
-		)
-		return self.__p_output, self.__stream_output
+		self.__live_monitor = None
+		self.__backend = backend or PyAudioBackend()
+		if duplex:
+			self.__live_monitor = LiveMonitor(self.__chunk_size, self.__channels, self.__format, self.__rate)
+		self.__input_open = False
+		self.__output_open = False
+		self.__output_callback = None
+		self.__output_chunk_size = None
+
+	def __init_buffers(self, chunk_size, ring_chunks):
+		self.__chunk_size = chunk_size
+		self.__ring_chunks = ring_chunks
+
+		self.__ring = RingBuffer(chunk_size * self.__channels * ring_chunks, dtype='float32')
+		self.__input_samples = np.zeros(chunk_size * self.__channels, dtype=np.float32)
+
+		self.__capture_times = RingBuffer(ring_chunks, dtype='float64')
+		self.__capture_time = np.zeros(1)
+		self.__drained_times = np.zeros(ring_chunks)
+		self.__last_capture_times = self.__drained_times[:0]
+
+	def __open_input(self):
+		if self.__duplex:
+			self.__backend.open_duplex(self.recv_frame_callback, self.__format, self.__channels, self.__rate, self.__chunk_size)
+		else:
+			self.__backend.open_input(self.recv_frame_callback, self.__format, self.__channels, self.__rate, self.__chunk_size)
+		self.__input_open = True
+
+	def __open_output(self):
+		if self.__output_callback:
+			self.__backend.open_output(self.__format, self.__channels, self.__rate, self.__send_frame_callback, self.__output_chunk_size)
+		else:
+			self.__backend.open_output(self.__format, self.__channels, self.__rate)
+		self.__output_open = True
+
+	@property
+	def backend(self):
+		return self.__backend
+
+	@property
+	def live_monitor(self):
+		return self.__live_monitor
+
+	@property
+	def format(self):
+		return self.__format
+
+	@property
+	def channels(self):
+		return self.__channels
+
+	@property
+	def rate(self):
+		return self.__rate
+
+	@property
+	def chunk_size(self):
+		return self.__chunk_size
+
+	@property
+	def ring_chunks(self):
+		return self.__ring_chunks
+
+	@property
+	def latency(self):
+		# Round trip through the duplex stream in seconds: one input and one
+		# output buffer plus the effect's own delay.
+		frames = 2 * self.__chunk_size
+		if self.__live_monitor:
+			frames += self.__live_monitor.latency
+		return frames / self.__rate
+
+	@property
+	def captured_frames(self):
+		ring = self.__ring
+		return self.__captured_before + (ring.written_samples + ring.dropped_samples) // self.__channels
+
+	@property
+	def overflow_count(self):
+		return self.__ring.overflow_count
+
+	@property
+	def dropped_samples(self):
+		return self.__ring.dropped_samples
+
+	def xrun_counts(self):
+		# Device xruns from the callback status flags and blocking writes,
+		# plus ring overflows when the consumer falls behind.
+		return {
+			'input_overflow': self.__input_overflows,
+			'input_underflow': self.__input_underflows,
+			'output_underflow': self.__output_underflows + self.__backend.output_underflows,
+			'output_overflow': self.__output_overflows,
+			'ring_overflow': self.__ring.overflow_count,
+		}
+
+	def reset_xrun_counts(self):
+		self.__input_overflows = 0
+		self.__input_underflows = 0
+		self.__output_underflows = 0
+		self.__output_overflows = 0
 
 	def recv_frame_callback(self, data, frame_count, time_info, status):
-		data = np.fromstring(data, 'int16')
-		with self.__lock:
-			self.__frames.append(data)
-			if self.__stop:
-				return None, pyaudio.paComplete
-		return data, pyaudio.paContinue
-	
+		if self.__stop:
+			return None, CALLBACK_COMPLETE
+		start = latency_monitor.now()
+
+		if status:
+			if status & INPUT_OVERFLOW:
+				self.__input_overflows += 1
+			if status & INPUT_UNDERFLOW:
+				self.__input_underflows += 1
+			if status & OUTPUT_UNDERFLOW:
+				self.__output_underflows += 1
+			if status & OUTPUT_OVERFLOW:
+				self.__output_overflows += 1
+
+		# Stamp the chunk with the time its first sample hit the ADC, in
+		# latency_monitor's clock.
+		capture_time = latency_monitor.now()
+		if time_info and time_info.get('input_buffer_adc_time') and time_info.get('current_time'):
+			adc_latency = time_info['current_time'] - time_info['input_buffer_adc_time']
+			capture_time -= adc_latency
+			if self.__monitor:
+				self.__monitor.record(latency_monitor.LatencyMonitor.STAGE_CAPTURE, adc_latency)
+
+		samples = sample_format.from_buffer(data, self.__format)
+		if samples.shape[0] > self.__input_samples.shape[0]:
+			self.__input_samples = np.zeros(samples.shape[0], dtype=np.float32)
+		samples = sample_format.to_float(samples, self.__format, out=self.__input_samples[:samples.shape[0]])
+
+		# The stamp goes in before the chunk, so a consumer that sees the
+		# chunk always finds its stamp. Only this thread uses up free space,
+		# so a chunk that fits now is still going to fit.
+		if self.__ring.free() >= samples.shape[0]:
+			self.__capture_time[0] = capture_time
+			self.__capture_times.write(self.__capture_time)
+		self.__ring.write(samples)
+		if not self.__frames_event.is_set():
+			self.__frames_event.set()
+
+		if self.__live_monitor:
+			data = self.__live_monitor.process(data)
+
+		self.__callback_seconds += latency_monitor.now() - start
+		self.__callback_frames += frame_count
+		return data, CALLBACK_CONTINUE
+
+	def wait_frames(self, timeout=None):
+		has_frames = self.__frames_event.wait(timeout)
+		self.__frames_event.clear()
+		return has_frames
+
+	def wake(self):
+		self.__frames_event.set()
+
 	def get_frames(self):
-		with self.__lock:
-			frames = self.__frames
-			self.__frames = []
-			return frames
-	
+		start = latency_monitor.now()
+		with self.__buffers_lock:
+			frames = self.__get_frames()
+			self.__consumer_seconds += latency_monitor.now() - start
+		return frames
+
+	def add_consumer_time(self, seconds):
+		# Time the consumer spent on frames after get_frames, so the buffer
+		# tuner sees a consumer that cannot keep up with small chunks.
+		with self.__buffers_lock:
+			self.__consumer_seconds += seconds
+
+	def __get_frames(self):
+		# The batch is copied out of the ring in one go and its slots are
+		# released at once: the frames are recorded and drawn on the GUI
+		# thread long after the InputThread comes back for the next batch.
+		self.__max_backlog = max(self.__max_backlog, self.__ring.available() / self.__ring.capacity)
+
+		chunk_samples = self.__chunk_size * self.__channels
+		size = self.__ring.available() // chunk_samples * chunk_samples
+		views = self.__ring.peek(size)
+		batch = np.concatenate(views) if len(views) > 1 else views[0].copy()
+		self.__ring.consume(size)
+		frames = list(batch.reshape((-1, self.__chunk_size, self.__channels)))
+
+		# One stamp per chunk, copied into a preallocated array.
+		start = 0
+		for times in self.__capture_times.peek(len(frames)):
+			self.__drained_times[start:start + times.shape[0]] = times
+			start += times.shape[0]
+		self.__capture_times.consume(start)
+		self.__last_capture_times = self.__drained_times[:start]
+
+		if self.__monitor and start:
+			drain_time = latency_monitor.now()
+			for capture_time in self.__last_capture_times:
+				self.__monitor.record(latency_monitor.LatencyMonitor.STAGE_RING, drain_time - capture_time)
+		return frames
+
+	def get_capture_times(self):
+		# Stamps of the last get_frames batch, valid until the next call.
+		return self.__last_capture_times
+
 	def write_frame(self, frame):
-		self.__stream_output.write(frame)
+		if not isinstance(frame, bytes):
+			frame = sample_format.to_bytes(sample_format.from_float(frame, self.__format), self.__format)
+		if not self.__output_open:
+			self.__open_output()
+		start = latency_monitor.now()
+		self.__backend.write(frame)
+		if self.__monitor:
+			self.__monitor.record_since(latency_monitor.LatencyMonitor.STAGE_PLAYBACK_WRITE, start)
 
 	def start(self):
 		self.start_input_stream()
@@ -69,21 +261,101 @@ class MicroRecorder(object):
 		self.stop_output_stream()
 
 	def start_input_stream(self):
-		self.__stream_input.start_stream()
+		if not self.__input_open:
+			self.__open_input()
+		self.__backend.start_input()
+		self.__input_running = True
 
 	def stop_input_stream(self):
-		self.__stream_input.stop_stream()
+		if self.__input_open:
+			self.__backend.stop_input()
+		self.__input_running = False
+
+	def set_buffer_size(self, chunk_size, ring_chunks=None):
+		# A stream's buffer size is fixed when it is opened, so the input is
+		# reopened.
+		ring_chunks = ring_chunks or self.__ring_chunks
+		if (chunk_size, ring_chunks) == (self.__chunk_size, self.__ring_chunks):
+			return
+
+		running = self.__input_running
+		if running:
+			self.stop_input_stream()
+		if self.__input_open:
+			self.__backend.close_input()
+			self.__input_open = False
+
+		with self.__buffers_lock:
+			self.__captured_before = self.captured_frames
+			self.__init_buffers(chunk_size, ring_chunks)
+			if self.__live_monitor:
+				self.__live_monitor.set_chunk_size(chunk_size)
+			self.__reset_load()
+
+		if running:
+			self.start_input_stream()
+
+	def tune(self, tuner):
+		# Feeds the interval's xruns, load and backlog to a BufferTuner and
+		# applies its decision. Returns True on a change. Reopening the input
+		# loses audio, so callers only tune while nothing is being recorded
+		# or monitored; until then the interval's counts keep adding up.
+		counts = self.xrun_counts()
+		ring_overflows = counts.pop('ring_overflow')
+		xruns = sum(counts.values())
+
+		audio_seconds = self.__callback_frames / self.__rate
+		busy_seconds = max(self.__callback_seconds, self.__consumer_seconds)
+		load = busy_seconds / audio_seconds if audio_seconds else 0.0
+
+		changed = tuner.update(
+			xruns=xruns - self.__tuned_xruns,
+			ring_overflows=ring_overflows - self.__tuned_ring_overflows,
+			load=load,
+			backlog=self.__max_backlog
+		)
+		self.__reset_load()
+		self.__tuned_xruns = xruns
+		self.__tuned_ring_overflows = ring_overflows
+
+		if changed:
+			self.set_buffer_size(tuner.chunk_size, tuner.ring_chunks)
+			self.__tuned_ring_overflows = 0
+		return changed
+
+	def __reset_load(self):
+		self.__callback_seconds = 0.0
+		self.__callback_frames = 0
+		self.__consumer_seconds = 0.0
+		self.__max_backlog = 0.0
 
 	def start_output_stream(self):
-		self.__stream_output.start_stream()
+		if not self.__output_open:
+			self.__open_output()
+		self.__backend.start_output()
 
 	def stop_output_stream(self):
-		self.__stream_output.stop_stream()
+		if self.__output_open:
+			self.__backend.stop_output()
+
+	def set_output_callback(self, callback, chunk_size=2048):
+		# Switches the output to pull blocks from callback(None, frame_count,
+		# time_info, status) -> (data, flag); None goes back to write_frame.
+		if self.__output_open:
+			self.__backend.stop_output()
+			self.__backend.close_output()
+			self.__output_open = False
+		self.__output_callback = callback
+		self.__output_chunk_size = chunk_size
+
+	def __send_frame_callback(self, data, frame_count, time_info, status):
+		if self.__stop:
+			return None, CALLBACK_COMPLETE
+		if status & OUTPUT_UNDERFLOW:
+			self.__output_underflows += 1
+		return self.__output_callback(data, frame_count, time_info, status)
 
 	def __close(self):
-		with self.__lock:
-			self.__stop = True
-		self.__stream_input.close()
-		self.__stream_output.close()
-		self.__p_input.terminate()
-		self.__p_output.terminate()
+		self.__stop = True
+		self.wake()
+		self.__backend.close()
@@ -1,60 +1,86 @@
 from PyQt5.QtCore import QThread, pyqtSignal
 
-import time
 import numpy as np
 
+import effect_chain
+import latency_monitor
+
+from effect_chain import VoiceEffectChain
+
 
 class OutputThread(QThread):
-	progress_signal = pyqtSignal(np.ndarray)
-	complete_signal = pyqtSignal()
+	# Producer for a PlaybackEngine: runs the effect chain over the frames
+	# from the engine's cursor onwards and keeps its prefetch queue full,
+	# starting over whenever the engine seeks.
+	EFFECT_RESAMPLE = effect_chain.EFFECT_RESAMPLE
+	EFFECT_PITCH_SHIFT = effect_chain.EFFECT_PITCH_SHIFT
+
 	error_signal = pyqtSignal(str, str)
 
-	def __init__(self, micro=None):
+	def __init__(self, engine=None, monitor=None, chunk_size=2048, channels=1, rate=44100):
 		super().__init__()
-		self.__micro = micro
+		self.__engine = engine
+		self.__monitor = monitor
 
-		self.__frequency_coeff = 1
+		self.__effect_chain = VoiceEffectChain(chunk_size, channels, rate)
 
 		self.__frames = []
 
 	def run(self):
-		if self.__micro:
-			for frame in self.__frames:
-				frame = self.__change_frequency(frame)
-				self.__play_frame(frame)
-				self.progress_signal.emit(frame)
-
-		self.complete_signal.emit()
+		if not self.__engine:
+			return
+
+		generation = None
+		while not self.isInterruptionRequested():
+			if self.__engine.generation != generation:
+				generation, index = self.__engine.cursor()
+				self.__effect_chain.reset()
+
+			if index >= len(self.__frames):
+				self.__engine.finish(generation, index)
+				self.__engine.wait_for_seek(generation, 0.1)
+				continue
+
+			if not self.__engine.wait_for_space(generation, 0.1):
+				continue
+
+			start = latency_monitor.now()
+			try:
+				frame = self.__change_frequency(self.__frames[index])
+			except Exception as e:
+				self.__send_error_message('Playback error', str(e))
+				return
+			if self.__monitor:
+				self.__monitor.record_since(latency_monitor.LatencyMonitor.STAGE_PROCESS, start)
+
+			if self.__engine.put(generation, index, frame):
+				index += 1
+
+	def stop(self):
+		self.requestInterruption()
+		self.wait()
 
 	def set_frames(self, frames):
 		self.__frames = frames
 
-	def set_frequency_coeff(self, coeff):
-		self.__frequency_coeff = coeff
-
-	def __play_frame(self, frame):
-		self.__micro.write_frame(frame.tobytes())
+	@property
+	def effect_chain(self):
+		return self.__effect_chain
 
-	def __change_frequency(self, frame):
-		new_frame = []
-		new_indicies = []
-
-		for ind, item in enumerate(frame):
-			new_indicies.append(ind * self.__frequency_coeff)
+	def set_frequency_coeff(self, coeff):
+		self.__effect_chain.set_frequency_coeff(coeff)
 
-		new_indicies = np.asarray(new_indicies)
-		new_indicies = np.rint(new_indicies).astype(int)
+	def set_effect_mode(self, mode):
+		self.__effect_chain.set_effect_mode(mode)
 
-		for ind in new_indicies:
-			if ind >= len(frame):
-				break
-			new_frame.append(frame[ind])
+	def set_interpolation_mode(self, mode):
+		self.__effect_chain.set_interpolation_mode(mode)
 
-		new_frame = np.asarray(new_frame)
-		return new_frame
+	def __change_frequency(self, frame):
+		size = frame.shape[0]
+		np.copyto(self.__effect_chain.block(size), frame)
+		size = self.__effect_chain.run(size)
+		return self.__effect_chain.buffer[:size].copy()
 
 	def __send_error_message(self, title, message):
 		self.error_signal.emit(title, message)
-
-
-
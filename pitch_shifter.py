@@ -0,0 +1,79 @@
+import numpy as np
+
+from spectral_shifter import SpectralShifter
+
+
+class PitchShifter(SpectralShifter):
+	# Phase vocoder: moves each bin's magnitude and true frequency by ratio
+	# and keeps the phases running, so the duration does not change.
+	NAME = 'pitch'
+	MIN_RATIO = 0.1
+
+	def __init__(self, fft_size=2048, oversampling=4, ratio=1.0):
+		self.__bins = np.arange(fft_size // 2 + 1)
+		super().__init__(fft_size, oversampling)
+		self.__expected_phase = 2 * np.pi * self.hop_size * self.__bins / fft_size
+		self.set_ratio(ratio)
+
+	def set_ratio(self, ratio):
+		if ratio <= 0:
+			raise ValueError('Pitch ratio must be positive, got {}'.format(ratio))
+		ratio = max(ratio, self.MIN_RATIO)
+		target_bins = np.rint(self.__bins * ratio).astype(int)
+		sources = np.flatnonzero(target_bins < self.__bins.shape[0])
+		# Published in one assignment: process() may be running on the audio
+		# thread and must never pair new targets with old sources.
+		self.__target = (ratio, sources, target_bins[sources])
+
+	def reset(self):
+		super().reset()
+		size = self.__bins.shape[0]
+		self.__last_phase = np.zeros(size)
+		self.__sum_phase = np.zeros(size)
+
+		# Scratch for shift(), so a hop does not allocate its temporaries.
+		self.__magnitudes = np.zeros(size)
+		self.__phases = np.zeros(size)
+		self.__delta = np.zeros(size)
+		self.__shifted_magnitudes = np.zeros(size)
+		self.__shifted_bins = np.zeros(size)
+		self.__gathered = np.zeros(size)
+
+	def shift(self, spectrum):
+		hop = self.hop_size
+		fft_size = self.fft_size
+		ratio, sources, targets = self.__target
+
+		magnitudes = np.abs(spectrum, out=self.__magnitudes)
+		phases = np.arctan2(spectrum.imag, spectrum.real, out=self.__phases)
+
+		# Deviation from the bin's expected phase advance, wrapped to
+		# [-pi, pi), gives the true frequency in bins.
+		true_bins = np.subtract(phases, self.__last_phase, out=self.__delta)
+		np.copyto(self.__last_phase, phases)
+		true_bins -= self.__expected_phase
+		true_bins += np.pi
+		np.mod(true_bins, 2 * np.pi, out=true_bins)
+		true_bins -= np.pi
+		true_bins *= fft_size / (2 * np.pi * hop)
+		true_bins += self.__bins
+
+		gathered = self.__gathered[:sources.shape[0]]
+		shifted_magnitudes = self.__shifted_magnitudes
+		shifted_magnitudes.fill(0)
+		np.add.at(shifted_magnitudes, targets, np.take(magnitudes, sources, out=gathered))
+		shifted_bins = self.__shifted_bins
+		shifted_bins.fill(0)
+		np.take(true_bins, sources, out=gathered)
+		gathered *= ratio
+		shifted_bins[targets] = gathered
+
+		shifted_bins *= 2 * np.pi * hop / fft_size
+		self.__sum_phase += shifted_bins
+		np.mod(self.__sum_phase, 2 * np.pi, out=self.__sum_phase)
+
+		# The fresh spectrum from rfft is reused for the output.
+		np.multiply(self.__sum_phase, 1j, out=spectrum)
+		np.exp(spectrum, out=spectrum)
+		spectrum *= shifted_magnitudes
+		return spectrum
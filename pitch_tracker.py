@@ -0,0 +1,100 @@
+import numpy as np
+
+import fft_planner
+
+
+MIN_FREQUENCY = 60.0
+
+
+def get_analysis_size(rate, min_frequency=MIN_FREQUENCY, min_size=2048):
+	# Smallest power of two, at least min_size, whose first half still holds
+	# the longest period tracked, e.g. 2048 at 44.1 or 48 kHz and 4096 at
+	# 96 kHz.
+	max_lag = int(np.ceil(rate / min_frequency))
+	return max(fft_planner.next_power_of_two(2 * max_lag + 1), min_size)
+
+
+class PitchTracker(object):
+	# Estimates the fundamental frequency of each analysed frame from the
+	# spectrum SpectralAnalyzer already computed. The power spectrum gives
+	# the autocorrelation with one inverse FFT; dividing by the window's own
+	# autocorrelation undoes the taper, and YIN's cumulative mean normalized
+	# difference picks the period. The cost per frame is one size-point
+	# inverse FFT plus O(max lag) array work. One tracker per stream.
+
+	def __init__(self, rate=44100, size=2048, window=None, min_frequency=MIN_FREQUENCY, max_frequency=1000.0, threshold=0.2):
+		self.__rate = rate
+		self.__size = size
+		self.__threshold = threshold
+
+		self.__min_lag = max(int(rate / max_frequency), 2)
+		self.__max_lag = int(np.ceil(rate / min_frequency))
+		if self.__max_lag >= size // 2:
+			raise ValueError('Analysis size {} is too short for {} Hz at {} Hz'.format(size, min_frequency, rate))
+
+		self.__power = np.zeros(size // 2 + 1)
+		self.__lags = np.arange(self.__max_lag + 1)
+
+		window = np.hanning(size) if window is None else window
+		window_acf = np.fft.irfft(np.abs(np.fft.rfft(window)) ** 2, size)[:self.__max_lag + 1]
+		self.__window_acf = window_acf / window_acf[0]
+
+		self.reset()
+
+	@property
+	def f0(self):
+		# Hz, or nan while the input is unvoiced.
+		return self.__f0
+
+	@property
+	def confidence(self):
+		# 1 minus the normalized difference at the chosen period.
+		return self.__confidence
+
+	def reset(self):
+		self.__f0 = np.nan
+		self.__confidence = 0.0
+
+	def update(self, spectral_frame):
+		# Subscribable to SpectralAnalyzer. Channels are summed in power.
+		magnitude = spectral_frame.magnitude
+		power = np.square(magnitude)
+		if power.ndim > 1:
+			power = power.sum(axis=1)
+		self.__power[:power.shape[0]] = power
+		self.__power[power.shape[0]:] = 0
+
+		acf = np.fft.irfft(self.__power, self.__size)[:self.__max_lag + 1]
+		if acf[0] <= np.finfo(float).tiny:
+			self.reset()
+			return self.__f0
+
+		difference = 1 - acf / (acf[0] * self.__window_acf)
+		difference[0] = 0
+		cumulative = np.cumsum(difference)
+		cumulative[0] = 1
+		cmnd = difference * self.__lags / np.maximum(cumulative, np.finfo(float).tiny)
+		cmnd[0] = 1
+
+		search = cmnd[self.__min_lag:]
+		dips = np.flatnonzero(search < self.__threshold)
+		if not dips.size:
+			self.reset()
+			return self.__f0
+
+		# Walk down from the first crossing to the bottom of its dip.
+		lag = dips[0]
+		rising = np.flatnonzero(np.diff(search[lag:]) >= 0)
+		lag += rising[0] if rising.size else search.shape[0] - 1 - lag
+		lag += self.__min_lag
+
+		offset = 0.0
+		if 0 < lag < self.__max_lag:
+			left, centre, right = cmnd[lag - 1:lag + 2]
+			curvature = left - 2 * centre + right
+			if curvature > 0:
+				offset = 0.5 * (left - right) / curvature
+
+		self.__f0 = self.__rate / (lag + offset)
+		self.__confidence = float(1 - cmnd[lag])
+		return self.__f0
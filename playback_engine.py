@@ -0,0 +1,236 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+import collections
+import time
+
+import numpy as np
+
+import sample_format
+import latency_monitor
+
+from audio_backend import CALLBACK_CONTINUE
+
+
+class PlaybackEngine(QObject):
+	# Plays processed blocks from the output callback. A producer (see
+	# OutputThread) keeps a bounded queue of blocks ahead of the device, so a
+	# busy GUI only eats into the prefetch instead of the device buffer.
+	# start, seek and stop bump the generation; blocks queued for an older
+	# generation are dropped on both sides.
+	#
+	# The callback never takes a lock or touches Qt. Each side only writes
+	# its own attributes: the GUI publishes the cursor, the producer appends
+	# to the deque (appends and pops are atomic) and publishes where it
+	# finished, and the callback publishes a status tuple. A timer on the
+	# GUI thread polls the status and emits the position and completion.
+	POLL_INTERVAL = 0.002
+	STATUS_INTERVAL_MS = 15
+
+	position_signal = pyqtSignal(int)
+	complete_signal = pyqtSignal()
+
+	def __init__(self, micro, chunk_size=2048, prefetch_chunks=8, monitor=None):
+		super().__init__()
+		self.__micro = micro
+		self.__monitor = monitor
+		self.__format = micro.format
+		self.__channels = micro.channels
+		self.__prefetch_chunks = prefetch_chunks
+
+		self.__queue = collections.deque()
+		self.__cursor = (0, 0)
+		self.__finished = (None, None)
+		self.__playing = False
+		self.__paused = False
+
+		# Written by the callback only.
+		self.__status = (0, 0, None, False)
+		self.__underflows = 0
+		self.__played_generation = 0
+		self.__block = None
+		self.__offset = 0
+		self.__primed = False
+
+		self.__reported_index = None
+		self.__status_timer = QTimer(self)
+		self.__status_timer.setInterval(self.STATUS_INTERVAL_MS)
+		self.__status_timer.timeout.connect(self.__poll_status)
+
+		self.__init_buffers(chunk_size)
+		micro.set_output_callback(self.__send_callback, chunk_size)
+
+	def __init_buffers(self, frame_count):
+		self.__output = np.zeros((frame_count, self.__channels), dtype=np.float32)
+		self.__samples = np.zeros((frame_count, self.__channels), dtype=sample_format.get_format(self.__format).dtype)
+		if self.__format == sample_format.INT24:
+			self.__output_bytes = None
+		else:
+			self.__output_bytes = memoryview(self.__samples.reshape(-1).view(np.uint8)).toreadonly()
+
+	@property
+	def generation(self):
+		return self.__cursor[0]
+
+	@property
+	def position(self):
+		return self.__status[1]
+
+	@property
+	def playing_block(self):
+		generation, _, block, _ = self.__status
+		return block if generation == self.generation else None
+
+	@property
+	def playing(self):
+		generation, _, _, complete = self.__status
+		return self.__playing and not (complete and generation == self.generation)
+
+	@property
+	def paused(self):
+		return self.__paused
+
+	@property
+	def underflows(self):
+		return self.__underflows
+
+	def start(self, index=0):
+		self.__restart(index)
+		self.__playing = True
+		self.__paused = False
+		self.__micro.start_output_stream()
+		self.__status_timer.start()
+
+	def stop(self):
+		self.__restart(0)
+		self.__playing = False
+		self.__status_timer.stop()
+		self.__micro.stop_output_stream()
+
+	def seek(self, index):
+		self.__restart(index)
+
+	def pause(self):
+		self.__paused = True
+
+	def resume(self):
+		self.__paused = False
+
+	def __restart(self, index):
+		self.__cursor = (self.__cursor[0] + 1, max(index, 0))
+		self.__reported_index = None
+
+	def __poll_status(self):
+		generation, index, _, complete = self.__status
+		if generation != self.generation:
+			return
+		if index != self.__reported_index:
+			self.__reported_index = index
+			self.position_signal.emit(index)
+		if complete and self.__playing:
+			self.__playing = False
+			self.__status_timer.stop()
+			self.complete_signal.emit()
+
+	# Producer side.
+
+	def cursor(self):
+		# The generation and the index its first block should have.
+		return self.__cursor
+
+	def wait_for_space(self, generation, timeout=None):
+		# True once a block for generation fits in the queue; False if the
+		# generation changed or the wait timed out. The callback cannot
+		# signal without a lock, so the producer polls.
+		return self.__poll(
+			lambda: generation != self.generation or len(self.__queue) < self.__prefetch_chunks,
+			timeout
+		) and generation == self.generation and len(self.__queue) < self.__prefetch_chunks
+
+	def wait_for_seek(self, generation, timeout=None):
+		self.__poll(lambda: generation != self.generation, timeout)
+
+	def __poll(self, predicate, timeout):
+		deadline = None if timeout is None else time.monotonic() + timeout
+		while not predicate():
+			if deadline is not None and time.monotonic() >= deadline:
+				return False
+			time.sleep(self.POLL_INTERVAL)
+		return True
+
+	def put(self, generation, index, block):
+		if generation != self.generation:
+			return False
+		self.__queue.append((generation, index, block))
+		return True
+
+	def finish(self, generation, end_index):
+		# Called once the producer has queued every block up to end_index.
+		if generation == self.generation:
+			self.__finished = (generation, end_index)
+
+	# Audio callback side.
+
+	def __send_callback(self, data, frame_count, time_info, status):
+		start = latency_monitor.now()
+		if frame_count > self.__output.shape[0]:
+			self.__init_buffers(frame_count)
+		output = self.__output[:frame_count]
+
+		generation, index = self.__cursor
+		if generation != self.__played_generation:
+			self.__played_generation = generation
+			self.__block = None
+			self.__offset = 0
+			self.__primed = False
+			self.__status = (generation, index, None, False)
+
+		filled = 0
+		if self.__playing and not self.__paused and not self.__status[3]:
+			filled = self.__fill(output, generation)
+		else:
+			self.__drop_stale(generation)
+		output[filled:] = 0
+
+		samples = sample_format.from_float(output, self.__format, out=self.__samples[:frame_count])
+		if self.__output_bytes is None:
+			data = sample_format.to_bytes(samples, self.__format)
+		else:
+			data = self.__output_bytes[:samples.nbytes]
+		if self.__monitor:
+			self.__monitor.record_since(latency_monitor.LatencyMonitor.STAGE_PLAYBACK_WRITE, start)
+		return data, CALLBACK_CONTINUE
+
+	def __drop_stale(self, generation):
+		# Blocks queued before a seek are still there; the producer may even
+		# have queued one just after it.
+		while self.__queue and self.__queue[0][0] != generation:
+			self.__queue.popleft()
+
+	def __fill(self, output, generation):
+		filled = 0
+		while filled < output.shape[0]:
+			if self.__block is None:
+				self.__drop_stale(generation)
+				if not self.__queue:
+					break
+				_, index, self.__block = self.__queue.popleft()
+				self.__primed = True
+				self.__offset = 0
+				self.__status = (generation, index, self.__block, False)
+
+			count = min(output.shape[0] - filled, self.__block.shape[0] - self.__offset)
+			output[filled:filled + count] = self.__block[self.__offset:self.__offset + count].reshape(count, -1)
+			filled += count
+			self.__offset += count
+			if self.__offset == self.__block.shape[0]:
+				self.__block = None
+
+		if filled < output.shape[0]:
+			if self.__finished[0] == generation and not self.__queue:
+				_, index, block, _ = self.__status
+				self.__status = (generation, index, block, True)
+			elif self.__primed:
+				# Before the first block after a start or seek the producer
+				# is still catching up; that silence is not an underflow.
+				self.__underflows += 1
+		return filled
@@ -0,0 +1,91 @@
+import array
+import tempfile
+
+import numpy as np
+
+
+class RecordStorage(object):
+	# Chunks are appended to an unlinked temporary file and read back as views
+	# into a memory map of it, so only the page cache holds the recording.
+
+	def __init__(self, dtype='int16', directory=None):
+		self.__dtype = np.dtype(dtype)
+		self.__directory = directory
+
+		self.__file = tempfile.TemporaryFile(dir=directory)
+		self.__map = None
+		self.__frame_shape = None
+
+		self.__offsets = array.array('q', [0])
+
+	def __len__(self):
+		return len(self.__offsets) - 1
+
+	def __getitem__(self, ind):
+		if isinstance(ind, slice):
+			return [self[i] for i in range(*ind.indices(len(self)))]
+		if ind < 0:
+			ind += len(self)
+		if not 0 <= ind < len(self):
+			raise IndexError('record chunk index out of range')
+
+		start, end = self.__offsets[ind], self.__offsets[ind + 1]
+		if start == end:
+			# Empty chunks need no mapping, and an empty file cannot be mapped.
+			return np.empty((0,) + (self.__frame_shape or ()), dtype=self.__dtype)
+		return self.__get_map()[start:end]
+
+	def __iter__(self):
+		for ind in range(len(self)):
+			yield self[ind]
+
+	@property
+	def dtype(self):
+		return self.__dtype
+
+	@property
+	def samples(self):
+		return self.__offsets[-1]
+
+	@property
+	def nbytes(self):
+		return self.samples * self.__dtype.itemsize * int(np.prod(self.__frame_shape or ()))
+
+	def append(self, frame):
+		frame = np.ascontiguousarray(frame, dtype=self.__dtype)
+		if self.__frame_shape is None:
+			self.__frame_shape = frame.shape[1:]
+		elif frame.shape[1:] != self.__frame_shape:
+			raise ValueError('Expected frames of shape (n, {}), got {}'.format(self.__frame_shape, frame.shape))
+
+		self.__file.seek(0, 2)
+		self.__file.write(frame.data)
+		self.__offsets.append(self.__offsets[-1] + frame.shape[0])
+
+	def extend(self, frames):
+		for frame in frames:
+			self.append(frame)
+
+	def clear(self):
+		# Start a new file rather than truncating: views handed out earlier
+		# keep the old mapping alive and must not fault.
+		self.__file.close()
+		self.__file = tempfile.TemporaryFile(dir=self.__directory)
+		self.__map = None
+		self.__frame_shape = None
+		self.__offsets = array.array('q', [0])
+
+	def close(self):
+		self.__map = None
+		self.__file.close()
+
+	def __get_map(self):
+		if self.__map is None or self.__map.shape[0] != self.samples:
+			self.__file.flush()
+			self.__map = np.memmap(
+				self.__file,
+				dtype=self.__dtype,
+				mode='r',
+				shape=(self.samples,) + self.__frame_shape
+			)
+		return self.__map
@@ -0,0 +1,96 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import collections
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import utils
+
+
+class RecoveryWorker(QObject):
+	progress_signal = pyqtSignal(int, int)
+	complete_signal = pyqtSignal()
+	error_signal = pyqtSignal(str, str)
+
+	def __init__(self, storage, workers=2, transform=utils.recover_frame):
+		super().__init__()
+		self.__storage = storage
+		self.__transform = transform
+		self.__executor = ThreadPoolExecutor(max_workers=workers)
+
+		self.__lock = threading.Lock()
+		self.__generation = 0
+		self.__futures = collections.deque()
+		self.__stored = 0
+		self.__finishing = False
+		self.__complete = False
+
+	@property
+	def submitted(self):
+		return self.__stored + len(self.__futures)
+
+	@property
+	def completed(self):
+		return self.__stored
+
+	def is_complete(self):
+		return self.__complete
+
+	def submit(self, frame):
+		with self.__lock:
+			generation = self.__generation
+			future = self.__executor.submit(self.__transform, frame)
+			self.__futures.append(future)
+		future.add_done_callback(lambda future: self.__store_completed(generation))
+
+	def finish(self):
+		with self.__lock:
+			self.__finishing = True
+			is_complete = self.__check_complete()
+		if is_complete:
+			self.complete_signal.emit()
+
+	def reset(self):
+		with self.__lock:
+			self.__generation += 1
+			for future in self.__futures:
+				future.cancel()
+			self.__futures = collections.deque()
+			self.__stored = 0
+			self.__finishing = False
+			self.__complete = False
+
+	def shutdown(self):
+		self.reset()
+		self.__executor.shutdown(wait=True)
+
+	def __store_completed(self, generation):
+		with self.__lock:
+			if generation != self.__generation:
+				return
+
+			while self.__futures and self.__futures[0].done():
+				future = self.__futures.popleft()
+				if future.cancelled():
+					continue
+				error = future.exception()
+				if error:
+					self.error_signal.emit('Recovery error', str(error))
+					continue
+				self.__storage.append(future.result())
+				self.__stored += 1
+
+			stored = self.__stored
+			submitted = self.__stored + len(self.__futures)
+			is_complete = self.__check_complete()
+
+		self.progress_signal.emit(stored, submitted)
+		if is_complete:
+			self.complete_signal.emit()
+
+	def __check_complete(self):
+		if self.__complete or not self.__finishing or self.__futures:
+			return False
+		self.__complete = True
+		return True
@@ -0,0 +1,40 @@
+from PyQt5.QtCore import QObject, QTimer
+
+import time
+
+
+class RenderScheduler(QObject):
+	def __init__(self, fps=30):
+		super().__init__()
+		self.__interval = 1 / fps
+		self.__last_render = 0
+
+		self.__pending = {}
+
+		self.__timer = QTimer()
+		self.__timer.setSingleShot(True)
+		self.__timer.timeout.connect(self.__render)
+
+	@property
+	def fps(self):
+		return 1 / self.__interval
+
+	def set_fps(self, fps):
+		self.__interval = 1 / fps
+
+	def submit(self, key, callback, *args):
+		# Only the latest submission per key is drawn, older ones are dropped.
+		self.__pending[key] = (callback, args)
+		if not self.__timer.isActive():
+			delay = self.__last_render + self.__interval - time.monotonic()
+			self.__timer.start(max(0, int(delay * 1000)))
+
+	def cancel(self, key):
+		self.__pending.pop(key, None)
+
+	def __render(self):
+		self.__last_render = time.monotonic()
+		pending = self.__pending
+		self.__pending = {}
+		for callback, args in pending.values():
+			callback(*args)
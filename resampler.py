@@ -0,0 +1,131 @@
+import numpy as np
+
+
+class Resampler(object):
+	MODE_NEAREST = 'nearest'
+	MODE_LINEAR = 'linear'
+	MODE_SINC = 'sinc'
+
+	MODES = (MODE_NEAREST, MODE_LINEAR, MODE_SINC)
+
+	def __init__(self, mode=MODE_NEAREST, sinc_half_width=8):
+		if mode not in self.MODES:
+			raise ValueError('Unknown interpolation mode: {}'.format(mode))
+
+		self.__mode = mode
+		self.__sinc_half_width = sinc_half_width
+
+		self.__tables = {}
+		self.__scratch = {}
+
+	@property
+	def mode(self):
+		return self.__mode
+
+	def set_mode(self, mode):
+		if mode not in self.MODES:
+			raise ValueError('Unknown interpolation mode: {}'.format(mode))
+		self.__mode = mode
+
+	def clear_cache(self):
+		self.__tables = {}
+		self.__scratch = {}
+
+	def resample(self, frame, coeff):
+		frame = np.asarray(frame)
+		indices, weights = self.__get_tables(frame.shape[0], coeff)
+
+		if weights is None:
+			return frame[indices]
+
+		new_frame = np.einsum('ij...,ij->i...', frame[indices], weights)
+		if np.issubdtype(frame.dtype, np.integer):
+			info = np.iinfo(frame.dtype)
+			new_frame = np.clip(np.rint(new_frame), info.min, info.max)
+		return new_frame.astype(frame.dtype, copy=False)
+
+	def resample_into(self, frame, coeff, out):
+		# Allocation-free variant for float frames: writes the resampled frame
+		# to the head of out and returns its length.
+		indices, weights = self.__get_tables(frame.shape[0], coeff)
+		size = indices.shape[0]
+
+		if weights is None:
+			np.take(frame, indices, axis=0, out=out[:size])
+			return size
+
+		scratch = self.__get_scratch(indices.shape + frame.shape[1:], out.dtype)
+		np.take(frame, indices, axis=0, out=scratch)
+		if frame.ndim > 1:
+			weights = weights[:, :, None]
+		np.multiply(scratch, weights, out=scratch)
+		np.sum(scratch, axis=1, out=out[:size])
+		return size
+
+	def __get_scratch(self, shape, dtype):
+		key = (shape, dtype)
+		scratch = self.__scratch.get(key)
+		if scratch is None:
+			scratch = np.empty(shape, dtype=dtype)
+			self.__scratch[key] = scratch
+		return scratch
+
+	def __get_tables(self, size, coeff):
+		key = (self.__mode, size, float(coeff))
+		tables = self.__tables.get(key)
+		if tables is None:
+			tables = self.__build_tables(size, float(coeff))
+			self.__tables[key] = tables
+		return tables
+
+	def __build_tables(self, size, coeff):
+		positions = np.arange(size) * coeff
+		rounded = np.rint(positions).astype(int)
+
+		# Same cut-off as the original per-sample loop: stop at the first
+		# position that falls outside of the frame.
+		out_of_range = (rounded >= size) | (rounded < -size)
+		if out_of_range.any():
+			length = int(np.argmax(out_of_range))
+			positions = positions[:length]
+			rounded = rounded[:length]
+
+		if self.__mode == self.MODE_NEAREST:
+			return rounded, None
+
+		positions = np.where(positions < 0, positions + size, positions)
+
+		if self.__mode == self.MODE_LINEAR:
+			return self.__build_linear_tables(size, positions)
+		return self.__build_sinc_tables(size, positions, coeff)
+
+	def __build_linear_tables(self, size, positions):
+		left = np.floor(positions).astype(int)
+		fraction = positions - left
+
+		indices = np.stack([left, left + 1], axis=1)
+		weights = np.stack([1 - fraction, fraction], axis=1)
+
+		indices = np.clip(indices, 0, size - 1)
+		return indices, weights
+
+	def __build_sinc_tables(self, size, positions, coeff):
+		half_width = self.__sinc_half_width
+		cutoff = min(1.0, 1.0 / abs(coeff)) if coeff else 1.0
+
+		left = np.floor(positions).astype(int)
+		taps = np.arange(-half_width + 1, half_width + 1)
+
+		indices = left[:, None] + taps[None, :]
+		distance = positions[:, None] - indices
+
+		window = 0.5 + 0.5 * np.cos(np.pi * distance / half_width)
+		window[np.abs(distance) >= half_width] = 0
+		weights = cutoff * np.sinc(cutoff * distance) * window
+
+		norm = weights.sum(axis=1, keepdims=True)
+		norm[norm == 0] = 1
+		weights /= norm
+
+		indices = np.clip(indices, 0, size - 1)
+		return indices, weights
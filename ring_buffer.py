@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class RingBuffer(object):
+	# Single-producer/single-consumer ring. Cursors only ever grow and each one
+	# is written by exactly one side, so publishing a cursor is a single
+	# attribute store and neither side needs a lock.
+
+	def __init__(self, capacity, dtype='int16'):
+		self.__capacity = capacity
+		self.__buffer = np.zeros(capacity, dtype=dtype)
+
+		self.__write_cursor = 0
+		self.__read_cursor = 0
+
+		self.__overflow_count = 0
+		self.__dropped_samples = 0
+
+	@property
+	def capacity(self):
+		return self.__capacity
+
+	@property
+	def dtype(self):
+		return self.__buffer.dtype
+
+	@property
+	def overflow_count(self):
+		return self.__overflow_count
+
+	@property
+	def dropped_samples(self):
+		return self.__dropped_samples
+
+	@property
+	def written_samples(self):
+		return self.__write_cursor
+
+	def available(self):
+		return self.__write_cursor - self.__read_cursor
+
+	def free(self):
+		return self.__capacity - self.available()
+
+	def write(self, data):
+		size = data.shape[0]
+		if size > self.free():
+			self.__overflow_count += 1
+			self.__dropped_samples += size
+			return 0
+
+		start = self.__write_cursor % self.__capacity
+		first = min(size, self.__capacity - start)
+		self.__buffer[start:start + first] = data[:first]
+		if first < size:
+			self.__buffer[:size - first] = data[first:]
+
+		self.__write_cursor += size
+		return size
+
+	def peek(self, size=None):
+		available = self.available()
+		if size is None or size > available:
+			size = available
+
+		start = self.__read_cursor % self.__capacity
+		first = min(size, self.__capacity - start)
+		views = [self.__buffer[start:start + first]]
+		if first < size:
+			views.append(self.__buffer[:size - first])
+		return views
+
+	def consume(self, size):
+		self.__read_cursor += min(size, self.available())
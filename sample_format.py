@@ -0,0 +1,91 @@
+import numpy as np
+
+
+# Values match the PortAudio sample format flags (pyaudio.paInt16 etc.).
+FLOAT32 = 1
+INT32 = 2
+INT24 = 4
+INT16 = 8
+
+
+class SampleFormat(object):
+	def __init__(self, name, pa_format, sample_width, dtype, full_scale):
+		self.name = name
+		self.pa_format = pa_format
+		self.sample_width = sample_width
+		self.dtype = np.dtype(dtype)
+		self.full_scale = full_scale
+
+
+FORMATS = {
+	FLOAT32: SampleFormat('float32', FLOAT32, 4, '<f4', 1.0),
+	INT32: SampleFormat('int32', INT32, 4, '<i4', 2.0 ** 31),
+	INT24: SampleFormat('int24', INT24, 3, '<i4', 2.0 ** 23),
+	INT16: SampleFormat('int16', INT16, 2, '<i2', 2.0 ** 15),
+}
+
+
+def get_format(pa_format):
+	try:
+		return FORMATS[pa_format]
+	except KeyError:
+		raise ValueError('Unsupported sample format: {}'.format(pa_format))
+
+def get_format_by_name(name):
+	for pa_format, sample_format in FORMATS.items():
+		if sample_format.name == name:
+			return pa_format
+	raise ValueError('Unsupported sample format: {}'.format(name))
+
+def get_format_by_width(sample_width):
+	# Integer PCM as stored in WAV files.
+	for pa_format in (INT16, INT24, INT32):
+		if FORMATS[pa_format].sample_width == sample_width:
+			return pa_format
+	raise ValueError('Unsupported sample width: {}'.format(sample_width))
+
+def from_buffer(data, pa_format=INT16, channels=1):
+	sample_format = get_format(pa_format)
+
+	if pa_format == INT24:
+		# Place the 3 bytes in the upper part of an int32 and shift back down,
+		# which sign-extends them. This is the only format that needs a copy.
+		packed = np.frombuffer(data, dtype=np.uint8).reshape((-1, 3))
+		padded = np.zeros((packed.shape[0], 4), dtype=np.uint8)
+		padded[:, 1:] = packed
+		samples = padded.view('<i4').ravel() >> 8
+	else:
+		samples = np.frombuffer(data, dtype=sample_format.dtype)
+
+	if channels > 1:
+		samples = samples.reshape((-1, channels))
+	return samples
+
+def to_bytes(samples, pa_format=INT16):
+	sample_format = get_format(pa_format)
+	samples = np.ascontiguousarray(samples, dtype=sample_format.dtype)
+
+	if pa_format == INT24:
+		return samples.reshape(-1, 1).view(np.uint8)[:, :3].tobytes()
+	return samples.tobytes()
+
+def to_float(samples, pa_format=INT16, out=None):
+	scale = 1 / get_format(pa_format).full_scale
+	if out is None:
+		out = np.empty(np.shape(samples), dtype=np.float32)
+	return np.multiply(samples, scale, out=out, casting='unsafe')
+
+def from_float(samples, pa_format=INT16, out=None):
+	sample_format = get_format(pa_format)
+	if pa_format == FLOAT32:
+		return np.clip(samples, -1, 1, out=out)
+
+	if out is None:
+		out = np.empty(np.shape(samples), dtype=sample_format.dtype)
+	high = sample_format.full_scale - 1
+	scaled = np.clip(np.multiply(samples, sample_format.full_scale), -sample_format.full_scale, high)
+	return np.rint(scaled, out=out, casting='unsafe')
+
+def to_display(samples, pa_format=INT16, low=0, high=255):
+	scale = (high - low) / (2 * get_format(pa_format).full_scale)
+	return np.asarray(samples, dtype=np.float32) * scale + (low + high) / 2
@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def polyharmonic(amplitudes, frequencies, phases, size, rate=None, start=0):
+	# Without a rate, frequencies are in periods per chunk of `size` samples.
+	rate = size if rate is None else rate
+	n = np.arange(start, start + size)
+
+	amplitudes = np.asarray(amplitudes, dtype=float)[:, None]
+	frequencies = np.asarray(frequencies, dtype=float)[:, None]
+	phases = np.asarray(phases, dtype=float)[:, None]
+
+	arguments = 2 * np.pi * frequencies * n / rate + phases
+	return np.sum(amplitudes * np.sin(arguments), axis=0)
+
+def chirp(start_frequency, end_frequency, sweep_duration, size, rate, start=0):
+	# Linear sweep that restarts every sweep_duration seconds.
+	t = (np.arange(start, start + size) / rate) % sweep_duration
+	slope = (end_frequency - start_frequency) / sweep_duration
+	return np.sin(2 * np.pi * (start_frequency * t + slope * t * t / 2))
+
+def noise(size, rng=None):
+	rng = np.random.default_rng() if rng is None else rng
+	return rng.uniform(-1, 1, size)
+
+
+class SignalGenerator(object):
+	KIND_POLYHARMONIC = 'polyharmonic'
+	KIND_CHIRP = 'chirp'
+	KIND_NOISE = 'noise'
+
+	KINDS = (KIND_POLYHARMONIC, KIND_CHIRP, KIND_NOISE)
+
+	def __init__(
+			self,
+			kind=KIND_POLYHARMONIC,
+			rate=44100,
+			amplitude=0.5,
+			frequencies=(220, 440, 880),
+			amplitudes=None,
+			phases=None,
+			sweep=(100, 8000, 5.0),
+			seed=0
+		):
+
+		if kind not in self.KINDS:
+			raise ValueError('Unknown signal kind: {}'.format(kind))
+
+		self.__kind = kind
+		self.__rate = rate
+		self.__amplitude = amplitude
+
+		self.__frequencies = np.asarray(frequencies, dtype=float)
+		if amplitudes is None:
+			amplitudes = np.full(len(frequencies), 1 / len(frequencies))
+		self.__amplitudes = np.asarray(amplitudes, dtype=float)
+		self.__phases = np.zeros(len(frequencies)) if phases is None else np.asarray(phases, dtype=float)
+
+		self.__sweep = sweep
+		self.__seed = seed
+
+		self.reset()
+
+	@property
+	def rate(self):
+		return self.__rate
+
+	@property
+	def position(self):
+		return self.__position
+
+	def reset(self):
+		self.__position = 0
+		self.__rng = np.random.default_rng(self.__seed)
+
+	def next_chunk(self, size):
+		if self.__kind == self.KIND_POLYHARMONIC:
+			chunk = polyharmonic(self.__amplitudes, self.__frequencies, self.__phases, size, self.__rate, self.__position)
+		elif self.__kind == self.KIND_CHIRP:
+			chunk = chirp(*self.__sweep, size=size, rate=self.__rate, start=self.__position)
+		else:
+			chunk = noise(size, self.__rng)
+
+		self.__position += size
+		return self.__amplitude * chunk
@@ -0,0 +1,105 @@
+import numpy as np
+
+
+class SpectralFrame(object):
+	def __init__(self, spectrum, size, amplitude_scale=None):
+		self.__spectrum = spectrum
+		self.__size = size
+		self.__amplitude_scale = 4 / size if amplitude_scale is None else amplitude_scale
+
+		self.__magnitude = None
+		self.__amplitude = None
+		self.__db = None
+		self.__phase = None
+
+	@property
+	def size(self):
+		return self.__size
+
+	@property
+	def spectrum(self):
+		return self.__spectrum
+
+	@property
+	def magnitude(self):
+		if self.__magnitude is None:
+			self.__magnitude = np.abs(self.__spectrum)
+		return self.__magnitude
+
+	@property
+	def amplitude(self):
+		# Magnitude divided by the window's gain, so a full-scale sine peaks
+		# at about 1.0 whatever the analysis size.
+		if self.__amplitude is None:
+			self.__amplitude = self.magnitude * self.__amplitude_scale
+		return self.__amplitude
+
+	@property
+	def db(self):
+		if self.__db is None:
+			amplitudes = np.maximum(self.magnitude / self.__size, np.finfo(float).tiny)
+			self.__db = 10 * np.log10(amplitudes)
+		return self.__db
+
+	@property
+	def phase(self):
+		if self.__phase is None:
+			self.__phase = np.angle(self.__spectrum)
+		return self.__phase
+
+	def mix(self, values):
+		# Average of (bins, channels) values, for single-curve displays.
+		return values if values.ndim == 1 else values.mean(axis=1)
+
+
+class SpectralAnalyzer(object):
+	def __init__(self, size, window=None):
+		self.__size = size
+		self.__window = np.hanning(size) if window is None else window
+		self.__columns_window = self.__window[:, None]
+		# A sine of amplitude A peaks at A * sum(window) / 2 in the rfft.
+		self.__amplitude_scale = 2 / np.sum(self.__window)
+		self.__subscribers = []
+
+		self.__block = None
+		self.__block_fill = 0
+
+	@property
+	def size(self):
+		return self.__size
+
+	def subscribe(self, callback):
+		self.__subscribers.append(callback)
+
+	def unsubscribe(self, callback):
+		self.__subscribers.remove(callback)
+
+	def feed(self, frame):
+		# Re-blocks frames of any length into analysis blocks of the fixed
+		# size, so the spectrum does not depend on the audio chunk size.
+		# Returns the frames analysed along the way.
+		if self.__block is None or self.__block.shape[1:] != frame.shape[1:]:
+			self.__block = np.zeros((self.__size,) + frame.shape[1:], dtype=frame.dtype)
+			self.__block_fill = 0
+
+		spectral_frames = []
+		ind = 0
+		while ind < frame.shape[0]:
+			take = min(self.__size - self.__block_fill, frame.shape[0] - ind)
+			self.__block[self.__block_fill:self.__block_fill + take] = frame[ind:ind + take]
+			self.__block_fill += take
+			ind += take
+
+			if self.__block_fill == self.__size:
+				spectral_frames.append(self.analyze(self.__block))
+				self.__block_fill = 0
+		return spectral_frames
+
+	def analyze(self, frame):
+		# frame is (size,) or (size, channels); channels are analysed together.
+		window = self.__window if frame.ndim == 1 else self.__columns_window
+		spectrum = np.fft.rfft(frame * window, axis=0)[:self.__size // 2]
+		spectral_frame = SpectralFrame(spectrum, self.__size, self.__amplitude_scale)
+		for callback in self.__subscribers:
+			callback(spectral_frame)
+		return spectral_frame
@@ -0,0 +1,100 @@
+import abc
+
+import numpy as np
+
+
+class SpectralShifter(abc.ABC):
+	# Streaming STFT shared by the pitch and formant shifters: the input is
+	# framed hop by hop (hop = fft_size / oversampling), each Hann-windowed
+	# frame's spectrum goes through shift(), and the result is overlap-added
+	# back. The output lags the input by fft_size samples.
+	NAME = None
+
+	def __init__(self, fft_size=2048, oversampling=4):
+		self.__fft_size = fft_size
+		self.__hop_size = fft_size // oversampling
+
+		self.__window = np.hanning(fft_size + 1)[:-1]
+		self.__synthesis_window = self.__window * self.__hop_size / np.sum(self.__window ** 2)
+		self.__frame = np.zeros(fft_size)
+
+		self.reset()
+
+	@property
+	def fft_size(self):
+		return self.__fft_size
+
+	@property
+	def hop_size(self):
+		return self.__hop_size
+
+	@property
+	def latency(self):
+		return self.__fft_size
+
+	@abc.abstractmethod
+	def set_ratio(self, ratio):
+		pass
+
+	@abc.abstractmethod
+	def shift(self, spectrum):
+		# Returns the spectrum to synthesize; may reuse spectrum in place.
+		pass
+
+	def reset(self):
+		self.__input = np.zeros(self.__fft_size)
+		self.__output = np.zeros(self.__fft_size)
+		self.__ready = np.zeros(self.__hop_size)
+		self.__position = 0
+
+	def process(self, frame):
+		frame = np.asarray(frame)
+		new_frame = self.process_into(frame, np.empty(frame.shape[0]))
+
+		if np.issubdtype(frame.dtype, np.integer):
+			info = np.iinfo(frame.dtype)
+			new_frame = np.clip(np.rint(new_frame), info.min, info.max)
+		return new_frame.astype(frame.dtype, copy=False)
+
+	def process_into(self, frame, out):
+		# out may be frame itself: each segment is read before it is written.
+		hop = self.__hop_size
+		tail = self.__fft_size - hop
+
+		ind = 0
+		while ind < frame.shape[0]:
+			take = min(hop - self.__position, frame.shape[0] - ind)
+			start = self.__position
+
+			self.__input[tail + start:tail + start + take] = frame[ind:ind + take]
+			out[ind:ind + take] = self.__ready[start:start + take]
+
+			self.__position += take
+			ind += take
+
+			if self.__position == hop:
+				self.__process_hop()
+				self.__position = 0
+		return out
+
+	def __process_hop(self):
+		hop = self.__hop_size
+
+		# numpy.fft has no out= before numpy 2, so the two transforms still
+		# allocate their results; everything else reuses preallocated arrays.
+		np.multiply(self.__input, self.__window, out=self.__frame)
+		spectrum = self.shift(np.fft.rfft(self.__frame))
+		np.multiply(np.fft.irfft(spectrum, self.__fft_size), self.__synthesis_window, out=self.__frame)
+		self.__output += self.__frame
+
+		self.__ready[:] = self.__output[:hop]
+		self.__shift_left(self.__output, hop)
+		self.__output[-hop:] = 0
+		self.__shift_left(self.__input, hop)
+
+	def __shift_left(self, values, hop):
+		# Overlapping slice assignment would copy through a temporary; going
+		# through the scratch frame does not.
+		size = values.shape[0] - hop
+		self.__frame[:size] = values[hop:]
+		values[:size] = self.__frame[:size]
@@ -0,0 +1,182 @@
+import array
+
+import numpy as np
+
+from record_storage import RecordStorage
+
+
+class EncodedFrame(object):
+	# A frame encoded by SpectralStorage.encode, ready to be appended.
+	__slots__ = ('size', 'scale', 'indices', 'coefficients', 'signal_energy', 'error_energy')
+
+	def __init__(self, size, scale, indices, coefficients, signal_energy, error_energy):
+		self.size = size
+		self.scale = scale
+		self.indices = indices
+		self.coefficients = coefficients
+		self.signal_energy = signal_energy
+		self.error_energy = error_energy
+
+
+class SpectralStorage(object):
+	# Keeps a recording as real FFT coefficients quantized to float16 and
+	# scaled by the frame's peak magnitude, optionally pruned to the top_k
+	# bins and/or the bins within threshold_db of the peak. Frames are
+	# decoded back to float32 samples when they are read, so a recording can
+	# be played straight from it. Reads match RecordStorage.
+
+	def __init__(self, dtype=np.float16, top_k=None, threshold_db=None, directory=None):
+		self.__dtype = np.dtype(dtype)
+		self.__top_k = top_k
+		self.__threshold = None if threshold_db is None else 10 ** (threshold_db / 20)
+		self.__pruned = top_k is not None or threshold_db is not None
+
+		self.__coefficients = RecordStorage(dtype=self.__dtype, directory=directory)
+		self.__indices = RecordStorage(dtype=np.uint16, directory=directory)
+		self.__reset()
+
+	def __reset(self):
+		self.__sizes = array.array('q')
+		self.__scales = array.array('f')
+		self.__samples = 0
+		self.__channels = None
+		self.__signal_energy = 0.0
+		self.__error_energy = 0.0
+
+	def __len__(self):
+		return len(self.__sizes)
+
+	def __getitem__(self, ind):
+		if isinstance(ind, slice):
+			return [self[i] for i in range(*ind.indices(len(self)))]
+		if ind < 0:
+			ind += len(self)
+		if not 0 <= ind < len(self):
+			raise IndexError('record chunk index out of range')
+		return self.decode(ind)
+
+	def __iter__(self):
+		for ind in range(len(self)):
+			yield self[ind]
+
+	@property
+	def samples(self):
+		return self.__samples
+
+	@property
+	def nbytes(self):
+		# Bytes actually stored, coefficients plus pruning indices and the
+		# per-frame size and scale.
+		return (
+			self.__coefficients.nbytes + self.__indices.nbytes +
+			len(self) * (self.__sizes.itemsize + self.__scales.itemsize)
+		)
+
+	@property
+	def pcm_nbytes(self):
+		# What the same frames take as float32 samples.
+		return self.__samples * (self.__channels or 1) * np.dtype(np.float32).itemsize
+
+	@property
+	def compression_ratio(self):
+		return self.pcm_nbytes / self.nbytes if self.nbytes else 0.0
+
+	@property
+	def snr_db(self):
+		# Signal to reconstruction error ratio over everything stored.
+		if not self.__error_energy:
+			return float('inf')
+		return 10 * np.log10(max(self.__signal_energy, np.finfo(float).tiny) / self.__error_energy)
+
+	def encode(self, frame):
+		# Thread-safe and stateless, so it can run in the recovery pool.
+		frame = np.asarray(frame, dtype=np.float32)
+		frame = frame.reshape(frame.shape[0], -1)
+		size = frame.shape[0]
+
+		spectrum = np.fft.rfft(frame, axis=0)
+		magnitudes = np.abs(spectrum)
+		scale = float(magnitudes.max()) or 1.0
+
+		indices = None
+		if self.__pruned:
+			if spectrum.shape[0] > np.iinfo(np.uint16).max + 1:
+				raise ValueError('Frames of {} samples are too long to prune'.format(size))
+			bin_magnitudes = magnitudes.max(axis=1)
+			indices = np.arange(len(bin_magnitudes))
+			if self.__threshold is not None:
+				indices = indices[bin_magnitudes >= self.__threshold * scale]
+			if self.__top_k is not None and len(indices) > self.__top_k:
+				top = np.argpartition(bin_magnitudes[indices], -self.__top_k)[-self.__top_k:]
+				indices = np.sort(indices[top])
+
+			# Every kept bin also costs an index, so a frame that keeps most
+			# of its bins (noise, say) is smaller stored whole.
+			coefficient_nbytes = frame.shape[1] * 2 * self.__dtype.itemsize
+			pruned_nbytes = len(indices) * (coefficient_nbytes + np.dtype(np.uint16).itemsize)
+			if pruned_nbytes < spectrum.shape[0] * coefficient_nbytes:
+				spectrum = spectrum[indices]
+			else:
+				indices = None
+
+		coefficients = np.ascontiguousarray(spectrum / scale, dtype=np.complex64).view(np.float32).astype(self.__dtype)
+		coefficients = coefficients.reshape(len(spectrum), frame.shape[1], 2)
+
+		recovered = self.__decode(size, scale, indices, coefficients)
+		return EncodedFrame(
+			size,
+			scale,
+			indices,
+			coefficients,
+			float(np.sum(np.square(frame, dtype=float))),
+			float(np.sum(np.square(recovered - frame, dtype=float)))
+		)
+
+	def append(self, encoded_frame):
+		# Takes a frame from encode(), or samples to encode here.
+		if not isinstance(encoded_frame, EncodedFrame):
+			encoded_frame = self.encode(encoded_frame)
+
+		channels = encoded_frame.coefficients.shape[1]
+		if self.__channels is None:
+			self.__channels = channels
+		elif channels != self.__channels:
+			raise ValueError('Expected frames with {} channels, got {}'.format(self.__channels, channels))
+
+		self.__coefficients.append(encoded_frame.coefficients)
+		self.__indices.append(np.empty(0) if encoded_frame.indices is None else encoded_frame.indices)
+		self.__sizes.append(encoded_frame.size)
+		self.__scales.append(encoded_frame.scale)
+		self.__samples += encoded_frame.size
+		self.__signal_energy += encoded_frame.signal_energy
+		self.__error_energy += encoded_frame.error_energy
+
+	def extend(self, frames):
+		for frame in frames:
+			self.append(frame)
+
+	def decode(self, ind):
+		# A pruned frame keeps at least its peak bin, so no indices means the
+		# frame was stored whole.
+		indices = self.__indices[ind] if self.__pruned else None
+		if indices is not None and not len(indices):
+			indices = None
+		return self.__decode(self.__sizes[ind], self.__scales[ind], indices, self.__coefficients[ind])
+
+	def clear(self):
+		self.__coefficients.clear()
+		self.__indices.clear()
+		self.__reset()
+
+	def close(self):
+		self.__coefficients.close()
+		self.__indices.close()
+
+	def __decode(self, size, scale, indices, coefficients):
+		values = coefficients.astype(np.float32).view(np.complex64)[..., 0] * np.float32(scale)
+		if indices is None:
+			spectrum = values
+		else:
+			spectrum = np.zeros((size // 2 + 1, coefficients.shape[1]), dtype=np.complex64)
+			spectrum[indices] = values
+		return np.fft.irfft(spectrum, size, axis=0).astype(np.float32)
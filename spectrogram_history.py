@@ -0,0 +1,47 @@
+import numpy as np
+
+
+class SpectrogramHistory(object):
+	# Every row is written twice, at index and index + length, so the rows in
+	# display order (oldest first) are always one contiguous slice. The price
+	# is 2 * length rows of storage: 1024 rows of 1024 float32 bins take the
+	# same 8 MB as the old float64 array. What goes away is the per-row copy
+	# and allocation of the whole history.
+
+	def __init__(self, length, bins, dtype=np.float32, fill_value=0):
+		self.__length = length
+		self.__bins = bins
+		if fill_value == 0:
+			# Zeroed pages are only committed when first written.
+			self.__buffer = np.zeros((2 * length, bins), dtype=dtype)
+		else:
+			self.__buffer = np.full((2 * length, bins), fill_value, dtype=dtype)
+		self.__index = 0
+
+	@property
+	def length(self):
+		return self.__length
+
+	@property
+	def bins(self):
+		return self.__bins
+
+	@property
+	def nbytes(self):
+		return self.__buffer.nbytes
+
+	@property
+	def shape(self):
+		return self.__length, self.__bins
+
+	def append(self, row):
+		self.__buffer[self.__index] = row
+		self.__buffer[self.__index + self.__length] = row
+		self.__index = (self.__index + 1) % self.__length
+
+	def view(self):
+		return self.__buffer[self.__index:self.__index + self.__length]
+
+	def clear(self, fill_value=0):
+		self.__buffer.fill(fill_value)
+		self.__index = 0
@@ -0,0 +1,56 @@
+from PyQt5.QtCore import QEvent, QObject, QTimer, pyqtSignal
+
+import time
+
+
+_start = time.perf_counter()
+_last = _start
+_phases = []
+
+
+def mark(phase):
+	# Closes the phase that started at the previous mark (or at the first
+	# import of this module).
+	global _last
+	now = time.perf_counter()
+	_phases.append((phase, now - _last))
+	_last = now
+
+
+def phases():
+	return list(_phases)
+
+
+def total():
+	return _last - _start
+
+
+def format_report():
+	lines = ['{:<24} {:>8.1f} ms'.format(phase, seconds * 1000) for phase, seconds in _phases]
+	lines.append('{:<24} {:>8.1f} ms'.format('total', total() * 1000))
+	return '\n'.join(lines)
+
+
+class FirstPaintWatcher(QObject):
+	# Emits painted_signal once, after the widget's first paint event has
+	# been handled, or after timeout ms if the window is never painted.
+	painted_signal = pyqtSignal()
+
+	def __init__(self, widget, timeout=1000):
+		super().__init__()
+		self.__widget = widget
+		self.__emitted = False
+		widget.installEventFilter(self)
+		QTimer.singleShot(timeout, self.__emit)
+
+	def eventFilter(self, watched, event):
+		if event.type() == QEvent.Paint and not self.__emitted:
+			QTimer.singleShot(0, self.__emit)
+		return False
+
+	def __emit(self):
+		if self.__emitted:
+			return
+		self.__emitted = True
+		self.__widget.removeEventFilter(self)
+		self.painted_signal.emit()
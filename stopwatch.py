@@ -1,36 +1,69 @@
 from PyQt5.QtCore import QObject, QTimer, pyqtSignal
 
+import time
+
 
 class Stopwatch(QObject):
 	progress_signal = pyqtSignal(int, int, int)
 	error_signal = pyqtSignal(str, str)
 
-	def __init__(self):
+	def __init__(self, display_rate=30, sample_clock=None, rate=None):
 		super().__init__()
-		self.__timeout_value = 1
-		
-		self.__counter = 0
+		self.__timeout_value = int(1000 / display_rate)
+
+		self.__sample_clock = sample_clock
+		self.__rate = rate
+
+		self.__start_time = None
+		self.__start_samples = 0
+		self.__elapsed = 0
+		self.__capture_duration = 0
 
 		self.__timer = QTimer()
 		self.__timer.timeout.connect(self.__tick)
 
+	def set_display_rate(self, display_rate):
+		self.__timeout_value = int(1000 / display_rate)
+		if self.__timer.isActive():
+			self.__timer.start(self.__timeout_value)
+
 	def start(self):
+		self.reset_counter()
+		self.__start_time = time.monotonic()
+		if self.__sample_clock:
+			self.__start_samples = self.__sample_clock()
 		self.__timer.start(self.__timeout_value)
 
 	def stop(self):
 		self.__timer.stop()
-		self.reset_counter()
+		self.__elapsed = self.elapsed()
+		self.__capture_duration = self.capture_duration()
+		self.__start_time = None
+		self.__tick()
 
 	def reset_counter(self):
-		self.__counter = 0
+		self.__start_time = None
+		self.__elapsed = 0
+		self.__capture_duration = 0
+
+	def elapsed(self):
+		if self.__start_time is None:
+			return self.__elapsed
+		return time.monotonic() - self.__start_time
+
+	def capture_duration(self):
+		if not self.__sample_clock or not self.__rate:
+			return self.elapsed()
+		if self.__start_time is None:
+			return self.__capture_duration
+		return (self.__sample_clock() - self.__start_samples) / self.__rate
 
 	def __tick(self):
-		self.__counter += 1
 		minutes, seconds, milliseconds = self.__count_time()
 		self.progress_signal.emit(minutes, seconds, milliseconds)
 
 	def __count_time(self):
-		milliseconds = self.__counter
+		milliseconds = int(self.capture_duration() * 1000)
 		minutes = (milliseconds // 1000) // 60
 		milliseconds -= minutes * 1000 * 60
 		seconds = milliseconds // 1000
@@ -0,0 +1,51 @@
+from buffer_tuner import BufferTuner
+from micro_recorder import MicroRecorder
+from audio_backend import NullBackend
+
+
+def run(tuner, updates, xrun_below=0, load=0.1):
+	sizes = []
+	for _ in range(updates):
+		chunk_size = tuner.chunk_size
+		tuner.update(xruns=int(chunk_size < xrun_below), load=load)
+		sizes.append(tuner.chunk_size)
+	return sizes
+
+
+def test_shrinks_after_quiet_intervals():
+	tuner = BufferTuner(chunk_size=2048, stable_updates=5)
+	sizes = run(tuner, 5)
+	assert sizes == [2048] * 4 + [1024]
+
+
+def test_settles_above_a_size_that_overran():
+	# A device that overruns below 512 frames: the tuner finds it once and
+	# then stays at 512 instead of cycling down and up again.
+	tuner = BufferTuner(chunk_size=2048, stable_updates=5)
+	sizes = run(tuner, 200, xrun_below=512)
+	assert sizes.count(256) == 1
+	assert sizes[-100:] == [512] * 100
+
+
+def test_busy_consumer_grows_the_chunk():
+	tuner = BufferTuner(chunk_size=256)
+	assert tuner.update(load=0.9)
+	assert tuner.chunk_size == 512
+	run(tuner, 50)
+	assert tuner.chunk_size == 512
+
+
+def test_recorder_counts_consumer_time():
+	micro = MicroRecorder(chunk_size=256, ring_chunks=16, backend=NullBackend(44100))
+	try:
+		micro.start_input_stream()
+		while micro.captured_frames < 44100 // 4:
+			micro.wait_frames(0.1)
+			micro.get_frames()
+		# A consumer that takes longer than the audio it was given.
+		micro.add_consumer_time(1.0)
+		tuner = BufferTuner(micro.chunk_size, micro.ring_chunks)
+		assert micro.tune(tuner)
+		assert micro.chunk_size == 512
+	finally:
+		micro.stop()
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+import fft_planner
+
+
+SIZES = (1, 2, 8, 2048, 4096, 1764, 441, 1000)
+
+# Absolute tolerance per unit of input magnitude; errors grow with log2(size).
+TOLERANCES = {
+	np.float64: 1e-10,
+	np.float32: 1e-4,
+}
+
+
+def get_frame(size, dtype, channels=None, seed=0):
+	shape = (size,) if channels is None else (size, channels)
+	return np.random.default_rng(seed).standard_normal(shape).astype(dtype)
+
+
+def get_atol(size, dtype):
+	return TOLERANCES[dtype] * max(np.sqrt(size), 1)
+
+
+@pytest.mark.parametrize('dtype', TOLERANCES)
+@pytest.mark.parametrize('size', SIZES)
+def test_fft_matches_numpy(size, dtype):
+	frame = get_frame(size, dtype)
+	spectrum = fft_planner.get_plan(size, dtype).fft(frame)
+	np.testing.assert_allclose(spectrum, np.fft.fft(frame.astype(np.float64)), rtol=0, atol=get_atol(size, dtype))
+
+
+@pytest.mark.parametrize('dtype', TOLERANCES)
+@pytest.mark.parametrize('size', SIZES)
+def test_ifft_inverts_fft(size, dtype):
+	frame = get_frame(size, dtype)
+	plan = fft_planner.get_plan(size, dtype)
+	np.testing.assert_allclose(plan.ifft(plan.fft(frame)).real, frame, rtol=0, atol=get_atol(size, dtype))
+
+
+@pytest.mark.parametrize('dtype', TOLERANCES)
+@pytest.mark.parametrize('size', SIZES)
+def test_rfft_matches_numpy(size, dtype):
+	frame = get_frame(size, dtype)
+	spectrum = fft_planner.get_plan(size, dtype).rfft(frame)
+	assert spectrum.shape == (size // 2 + 1,)
+	np.testing.assert_allclose(spectrum, np.fft.rfft(frame.astype(np.float64)), rtol=0, atol=get_atol(size, dtype))
+
+
+@pytest.mark.parametrize('dtype', TOLERANCES)
+@pytest.mark.parametrize('size', SIZES)
+def test_irfft_matches_numpy(size, dtype):
+	spectrum = np.fft.rfft(get_frame(size, np.float64))
+	frame = fft_planner.get_plan(size, dtype).irfft(spectrum)
+	assert frame.shape == (size,)
+	assert frame.dtype == np.dtype(dtype)
+	np.testing.assert_allclose(frame, np.fft.irfft(spectrum, n=size), rtol=0, atol=get_atol(size, dtype))
+
+
+@pytest.mark.parametrize('dtype', TOLERANCES)
+@pytest.mark.parametrize('size', (2048, 1764))
+def test_transforms_run_along_columns(size, dtype):
+	frame = get_frame(size, dtype, channels=2)
+	plan = fft_planner.get_plan(size, dtype)
+	atol = get_atol(size, dtype)
+
+	np.testing.assert_allclose(plan.fft(frame), np.fft.fft(frame.astype(np.float64), axis=0), rtol=0, atol=atol)
+	spectrum = plan.rfft(frame)
+	np.testing.assert_allclose(spectrum, np.fft.rfft(frame.astype(np.float64), axis=0), rtol=0, atol=atol)
+	np.testing.assert_allclose(plan.irfft(spectrum), frame, rtol=0, atol=atol)
+
+
+def test_plans_are_cached_per_size_and_dtype():
+	assert fft_planner.get_plan(2048) is fft_planner.get_plan(2048, np.float64)
+	assert fft_planner.get_plan(2048, np.float32) is not fft_planner.get_plan(2048)
+	assert fft_planner.get_plan(2048, np.float32).dtype == np.float32
+
+
+def test_wrong_length_is_rejected():
+	with pytest.raises(ValueError):
+		fft_planner.get_plan(2048).fft(np.zeros(1024))
+	with pytest.raises(ValueError):
+		fft_planner.get_plan(2048).irfft(np.zeros(1024))
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from pitch_tracker import PitchTracker, get_analysis_size
+from spectral_analysis import SpectralAnalyzer
+
+
+@pytest.mark.parametrize('rate, size', ((22050, 2048), (44100, 2048), (48000, 2048), (96000, 4096), (192000, 8192)))
+def test_analysis_size_holds_the_longest_period(rate, size):
+	assert get_analysis_size(rate) == size
+	PitchTracker(rate, size)
+
+
+def test_short_analysis_size_is_rejected():
+	with pytest.raises(ValueError):
+		PitchTracker(96000, 2048)
+
+
+@pytest.mark.parametrize('rate', (44100, 96000))
+@pytest.mark.parametrize('frequency', (80.0, 220.0))
+def test_tracks_a_tone(rate, frequency):
+	size = get_analysis_size(rate)
+	t = np.arange(size) / rate
+	signal = 0.5 * np.sin(2 * np.pi * frequency * t) + 0.2 * np.sin(2 * np.pi * 2 * frequency * t)
+	tracker = PitchTracker(rate, size)
+	tracker.update(SpectralAnalyzer(size).analyze(signal))
+	assert tracker.f0 == pytest.approx(frequency, rel=0.02)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from spectral_analysis import SpectralAnalyzer
+
+
+@pytest.mark.parametrize('size', (1024, 2048, 4096))
+@pytest.mark.parametrize('amplitude', (1.0, 0.1))
+def test_amplitude_of_bin_centred_sine(size, amplitude):
+	rate = 44100
+	frequency = rate * 40 / size
+	t = np.arange(size) / rate
+	spectral_frame = SpectralAnalyzer(size).analyze(amplitude * np.sin(2 * np.pi * frequency * t))
+	np.testing.assert_allclose(spectral_frame.amplitude.max(), amplitude, rtol=1e-5)
+
+
+def test_amplitude_fits_the_plot_range():
+	# Off-bin sines lose at most the Hann window's scalloping loss (~1.4 dB).
+	size = 2048
+	t = np.arange(size) / 44100
+	spectral_frame = SpectralAnalyzer(size).analyze(0.1 * np.sin(2 * np.pi * 440 * t))
+	assert 0.08 < spectral_frame.amplitude.max() <= 0.1
+
+
+def test_channels_share_the_scale():
+	size = 2048
+	t = np.arange(size) / 44100
+	sine = np.sin(2 * np.pi * 44100 * 40 / size * t)
+	spectral_frame = SpectralAnalyzer(size).analyze(np.stack([sine, 0.5 * sine], axis=1))
+	np.testing.assert_allclose(spectral_frame.amplitude.max(axis=0), [1.0, 0.5], rtol=1e-5)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from spectral_storage import SpectralStorage
+
+
+CHUNK_SIZE = 2048
+
+
+def get_frames(kind, chunks=8, channels=1, seed=0):
+	rng = np.random.default_rng(seed)
+	if kind == 'noise':
+		samples = rng.standard_normal((chunks * CHUNK_SIZE, channels))
+	else:
+		t = np.arange(chunks * CHUNK_SIZE)[:, None] / 44100
+		samples = sum(np.sin(2 * np.pi * frequency * t) for frequency in (220, 440, 880)) * np.ones(channels)
+	samples = (0.1 * samples).astype(np.float32)
+	return [samples[ind:ind + CHUNK_SIZE] for ind in range(0, samples.shape[0], CHUNK_SIZE)]
+
+
+def get_storage(frames, **options):
+	storage = SpectralStorage(**options)
+	storage.extend(frames)
+	return storage
+
+
+@pytest.mark.parametrize('channels', (1, 2))
+def test_noise_is_never_larger_than_dense(channels):
+	# Thresholding keeps nearly every bin of white noise; with an index per
+	# bin on top, those frames must fall back to dense storage.
+	frames = get_frames('noise', channels=channels)
+	dense = get_storage(frames)
+	pruned = get_storage(frames, threshold_db=-60)
+	assert pruned.nbytes <= dense.nbytes
+	assert pruned.snr_db == pytest.approx(dense.snr_db)
+	for dense_frame, pruned_frame in zip(dense, pruned):
+		np.testing.assert_array_equal(pruned_frame, dense_frame)
+
+
+def test_sparse_frames_stay_pruned():
+	frames = get_frames('tones')
+	dense = get_storage(frames)
+	pruned = get_storage(frames, threshold_db=-60, top_k=64)
+	assert pruned.nbytes < dense.nbytes / 4
+	assert pruned.snr_db > 20
+
+
+def test_mixed_frames_decode():
+	# Dense and pruned frames in one storage decode like they do apart.
+	tones = get_frames('tones', chunks=4)
+	noise = get_frames('noise', chunks=4)
+	storage = get_storage(tones + noise, threshold_db=-60)
+	expected = list(get_storage(tones, threshold_db=-60)) + list(get_storage(noise))
+	assert len(storage) == len(expected)
+	for decoded, frame in zip(storage, expected):
+		np.testing.assert_array_equal(decoded, frame)
@@ -1,7 +1,7 @@
 import numpy as np
-import struct
 
-from stopwatch import Stopwatch
+import fft_planner
+import signal_generator
 
 def sin_taylor(x):
 	eps = 0.0000001
@@ -24,61 +24,44 @@ def calc_harmonic_signal(A, N, n, phi, f):
 	return A * sin_taylor(arg)
 
 def calc_polyharmonic_signal(A_s, chunk_size, phi_s, f_s):
-	N = chunk_size
-	
-	data_x = np.arange(0, N)
+	return signal_generator.polyharmonic(A_s, f_s, phi_s, chunk_size)
 
-	data_y = np.zeros((N,), dtype=int)
-	for i, A in enumerate(A_s):
-		data_y = np.add(data_y, [calc_harmonic_signal(A, N, point_x, phi_s[i], f_s[i]) for point_x in data_x])
+def get_stopwatch(callback, display_rate=30, sample_clock=None, rate=None):
+	from stopwatch import Stopwatch
 
-def get_stopwatch(callback):
-	stopwatch = Stopwatch()
+	stopwatch = Stopwatch(display_rate, sample_clock, rate)
 	stopwatch.progress_signal.connect(callback)
 	return stopwatch
 
-def process_frame(frame):
-	frame = struct.unpack(str(2 * len(frame)) + 'B', frame)
-	frame = frame[::2]
-	frame = np.array(frame, dtype='b') + 128
-	return frame
-
-def fft_vectorized(frame):
-	frame = np.asarray(frame, dtype=float)
-	N = frame.shape[0]
+def decimate_peaks(frame, width):
+	# Keeps the min and max of every pixel column, so peaks survive decimation.
+	frame = np.asarray(frame)
+	if frame.shape[0] <= 2 * width:
+		return np.arange(frame.shape[0]), frame
 
-	N_min = min(N, 32)
-	
-	n = np.arange(N_min)
-	k = n[:, None]
-	M = np.exp(-2j * np.pi * n * k / N_min)
-	X = np.dot(M, frame.reshape((N_min, -1)))
+	edges = np.linspace(0, frame.shape[0], width + 1).astype(int)
+	minimums = np.minimum.reduceat(frame, edges[:-1])
+	maximums = np.maximum.reduceat(frame, edges[:-1])
 
-	while X.shape[0] < N:
-		X_even = X[:, :int(X.shape[1] / 2)]
-		X_odd = X[:, int(X.shape[1] / 2):]
-		factor = np.exp(-1j * np.pi * np.arange(X.shape[0]) / X.shape[0])[:, None]
-		X = np.vstack([X_even + factor * X_odd,
-					   X_even - factor * X_odd])
+	x = np.repeat(edges[:-1], 2)
+	y = np.empty(2 * width, dtype=frame.dtype)
+	y[0::2] = minimums
+	y[1::2] = maximums
+	return x, y
 
-	return X.ravel()
+def fft_vectorized(frame):
+	frame = np.asarray(frame, dtype=float)
+	return fft_planner.get_plan(frame.shape[0]).fft(frame)
 
 def ifft(frame):
-	return np.fft.ifft(frame)
-
-def transform_frame_for_spectrum(frame):
-	phi_s = []
-	frame = fft_vectorized(frame)
-	frame = frame[:int(len(frame) / 2)]
-	phi_s = [compl.imag / compl.real for compl in frame]
-	amplitudes = abs(frame)
-	return amplitudes, phi_s
+	frame = np.asarray(frame)
+	return fft_planner.get_plan(frame.shape[0]).ifft(frame)
 
-def transform_frame_for_spectrogram(frame, chunk_size, win, image_array):
-	amplitudes, phi_s = transform_frame_for_spectrum(frame * win)
-	amplitudes /= chunk_size
-	amplitudes = 10 * np.log10(amplitudes)
+def recover_frame(frame):
+	frame = np.asarray(frame)
+	if not np.issubdtype(frame.dtype, np.floating):
+		return ifft(fft_vectorized(frame)).real.astype(frame.dtype)
 
-	image_array = np.roll(image_array, -1, 0)
-	image_array[-1:] = amplitudes
-	return image_array
\ No newline at end of file
+	# Real input: the half-size transform pair gives the same round trip.
+	plan = fft_planner.get_plan(frame.shape[0], frame.dtype)
+	return plan.irfft(plan.rfft(frame)).astype(frame.dtype, copy=False)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import numpy as np
+
+import sample_format
+
+
+CALLBACK_CONTINUE = 0
+CALLBACK_COMPLETE = 1
+
+# PortAudio callback status flags (pyaudio.paInputOverflow etc.).
+INPUT_UNDERFLOW = 1
+INPUT_OVERFLOW = 2
+OUTPUT_UNDERFLOW = 4
+OUTPUT_OVERFLOW = 8
+
+
+class VirtualSource(object):
+	# Feeds generated chunks into a PortAudio-style input callback, either at
+	# the stream rate or as fast as the callback accepts them. Exposes the
+	# same start_stream/stop_stream/close calls as a PyAudio stream. The
+	# generator ends the stream by returning None.
+
+	def __init__(self, generator, realtime=True, max_chunks=None):
+		self.__generator = generator
+		self.__realtime = realtime
+		self.__max_chunks = max_chunks
+
+		self.__callback = None
+		self.__format = sample_format.INT16
+		self.__channels = 1
+		self.__rate = generator.rate
+		self.__chunk_size = 2048
+
+		self.__thread = None
+		self.__running = False
+		self.__chunks = 0
+
+	@property
+	def chunks(self):
+		return self.__chunks
+
+	def open(self, callback, format_=sample_format.INT16, channels=1, rate=None, chunk_size=2048):
+		self.__callback = callback
+		self.__format = format_
+		self.__channels = channels
+		self.__rate = rate or self.__generator.rate
+		self.__chunk_size = chunk_size
+
+	def start_stream(self):
+		if self.is_active():
+			return
+		self.__running = True
+		self.__thread = threading.Thread(target=self.__run, daemon=True)
+		self.__thread.start()
+
+	def stop_stream(self):
+		self.__running = False
+		if self.__thread and self.__thread is not threading.current_thread():
+			self.__thread.join()
+		self.__thread = None
+
+	def close(self):
+		self.stop_stream()
+
+	def is_active(self):
+		return self.__running and self.__thread is not None and self.__thread.is_alive()
+
+	def wait(self, timeout=None):
+		if self.__thread:
+			self.__thread.join(timeout)
+
+	def __run(self):
+		period = self.__chunk_size / self.__rate
+		start = time.perf_counter()
+		status = 0
+		# Paced from this start, so a restarted stream does not wait out the
+		# chunks of the previous run.
+		run_chunks = 0
+		late_chunks = 0
+
+		while self.__running:
+			if self.__max_chunks is not None and self.__chunks >= self.__max_chunks:
+				break
+
+			samples = self.__generator.next_chunk(self.__chunk_size)
+			if samples is None:
+				break
+			if samples.ndim == 1 and self.__channels > 1:
+				samples = np.repeat(samples[:, None], self.__channels, axis=1)
+			data = sample_format.to_bytes(sample_format.from_float(samples, self.__format), self.__format)
+
+			now = time.perf_counter()
+			time_info = {
+				'input_buffer_adc_time': now - period,
+				'current_time': now,
+				'output_buffer_dac_time': 0,
+			}
+			_, flag = self.__callback(data, self.__chunk_size, time_info, status)
+			self.__chunks += 1
+			run_chunks += 1
+			status = 0
+			if flag == CALLBACK_COMPLETE:
+				break
+
+			if self.__realtime:
+				delay = start + (run_chunks + late_chunks) * period - time.perf_counter()
+				if delay > 0:
+					time.sleep(delay)
+				elif delay < -period:
+					# A device would have dropped the input it had no room
+					# for; skip ahead and report it like PortAudio does.
+					status = INPUT_OVERFLOW
+					late_chunks += int(-delay // period)
+
+		self.__running = False
@@ -1,29 +1,54 @@
+import startup_timer
+
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import pyqtSlot
 
 import sys
-
-import pyqtgraph
+import wave
+import argparse
 
 import numpy as np
 
 import utils
+import sample_format
+import pitch_tracker
+import latency_monitor
 
 from voicechanger_view import Ui_form_voicechanger
 from micro_recorder import MicroRecorder
 from input_thread import InputThread
 from output_thread import OutputThread
+from playback_engine import PlaybackEngine
+from spectral_analysis import SpectralAnalyzer
+from pitch_tracker import PitchTracker
+from spectrogram_history import SpectrogramHistory
+from record_storage import RecordStorage
+from recovery_worker import RecoveryWorker
+from spectral_storage import SpectralStorage
+from analysis_worker import AnalysisWorker
+from render_scheduler import RenderScheduler
+from latency_monitor import LatencyMonitor
+from latency_panel import LatencyPanel
+from buffer_tuner import BufferTuner
+from signal_generator import SignalGenerator
+
+import audio_backend
+
+startup_timer.mark('imports')
 
 
 class VoiceChangerController(QtCore.QObject):
-	def __init__(self):
+	def __init__(self, backend=None, chunk_size=2048, rate=44100, channels=1, format_=sample_format.INT16, auto_buffer=False, analysis_process=True, recovery_storage=None, startup_report=False, live_monitoring=False, argv=None):
 		super().__init__()
-		self.__init_params()
+		self.__backend = backend
+		self.__argv = sys.argv if argv is None else argv
+		self.__init_params(chunk_size, rate, channels, format_, auto_buffer, analysis_process, recovery_storage, live_monitoring)
+		self.__startup_report = startup_report
 		self.__init_ui_form()
 		self.__init_scenes()
-		self.__init_plot_wdgs()
+		startup_timer.mark('window')
 
-	def __init_params(self):
+	def __init_params(self, chunk_size, rate, channels, format_, auto_buffer, analysis_process, recovery_storage, live_monitoring):
 		self.__canvas_width_default = 600
 		self.__canvas_height_default = 275
 
@@ -39,8 +64,25 @@ class VoiceChangerController(QtCore.QObject):
 		self.__canvas_width_output = self.__canvas_width_default
 		self.__canvas_height_output = self.__canvas_height_default
 
-		self.__rate = 44100
-		self.__chunk_size = 2048
+		self.__rate = rate
+		self.__chunk_size = chunk_size
+		self.__analysis_size = pitch_tracker.get_analysis_size(rate)
+		self.__analysis_process = analysis_process
+		self.__analysis_worker = None
+		self.__channels = channels
+		self.__format = format_
+		self.__live_monitoring = live_monitoring
+
+		self.__latency_monitor = LatencyMonitor()
+		self.__buffer_tuning = auto_buffer
+		self.__buffer_tuning_interval = 2000
+		self.__latency_panel_shortcut = 'F12'
+		self.__playback_prefetch_chunks = 8
+
+		self.__render_fps = 30
+		self.__stopwatch_display_rate = 30
+		self.__plot_x_ends = {}
+		self.__plot_colors = {}
 
 		self.__x_range = {
 			'start': 0,
@@ -64,16 +106,24 @@ class VoiceChangerController(QtCore.QObject):
 
 		self.__x_range_spectrum = {
 			'start': 0,
-			'end': self.__chunk_size / 2,
+			'end': self.__analysis_size / 2,
 		}
 
+		# SpectralFrame.amplitude: a full-scale sine peaks at 1.0.
 		self.__y_range_spectrum = {
 			'start': 0,
-			'end': 50000,
+			'end': 1.5,
 		}
 
-		self.__record_frames = []
-		self.__record_frames_fft = []
+		# About one row per pixel of the plot, ~24 s at 2048 samples per row.
+		self.__spectrogram_history_length = 512
+		self.__spectrogram_dtype = np.float32
+
+		self.__record_directory = None
+		self.__record_frames = RecordStorage(dtype=np.float32, directory=self.__record_directory)
+		self.__record_frames_fft = recovery_storage
+		if recovery_storage is None:
+			self.__record_frames_fft = RecordStorage(dtype=np.float32, directory=self.__record_directory)
 		self.__is_recording = False
 
 		self.__frequency_slider_range_min = -100
@@ -83,7 +133,7 @@ class VoiceChangerController(QtCore.QObject):
 		self.__frequency_slider_start_value = 10
 
 	def __init_ui_form(self):
-		self.app = QtWidgets.QApplication(sys.argv)
+		self.app = QtWidgets.QApplication(self.__argv)
 		self.form = QtWidgets.QMainWindow()
 		self.ui = Ui_form_voicechanger()
 		self.ui.setupUi(self.form)
@@ -111,6 +161,8 @@ class VoiceChangerController(QtCore.QObject):
 		)
 
 	def __init_plot_wdgs(self):
+		self.__render_scheduler = RenderScheduler(self.__render_fps)
+
 		self.__plot_wdg_input, self.__plot_item_input = self.__init_plot_wdg(
 			scene=self.__scene_input, 
 			x_range=self.__x_range, 
@@ -123,7 +175,7 @@ class VoiceChangerController(QtCore.QObject):
 			width=self.__canvas_width_spectrogram, 
 			height=self.__canvas_height_spectrogram
 		)
-		self.__spectrogram, self.__spectrogram_bar, self.__image_array, self.__win = self.__init_spectrogram_image(self.__plot_wdg_spectrogram, self.__plot_item_spectrogram)
+		self.__spectrogram, self.__spectrogram_bar, self.__spectrogram_history = self.__init_spectrogram_image(self.__plot_wdg_spectrogram, self.__plot_item_spectrogram)
 
 		self.__plot_wdg_spectrum, self.__plot_item_spectrum = self.__init_plot_wdg(
 			scene=self.__scene_spectrum, 
@@ -141,11 +193,46 @@ class VoiceChangerController(QtCore.QObject):
 			height=self.__canvas_height_output
 		)
 
+		self.__curve_input = self.__init_plot_curve(self.__plot_item_input)
+		self.__curve_spectrum = self.__init_plot_curve(self.__plot_item_spectrum)
+		self.__curve_output = self.__init_plot_curve(self.__plot_item_output)
+
+		self.__curve_pitch = self.__plot_item_spectrogram.plot(width=3, pen='c', connect='finite')
+		self.__pitch_history = SpectrogramHistory(self.__spectrogram_history_length, 1, fill_value=np.nan)
+		self.__pitch_history_x = np.arange(self.__spectrogram_history_length) * (self.__analysis_size / self.__rate)
+
+		self.__analyzer = SpectralAnalyzer(self.__analysis_size)
+		self.__pitch_tracker_input = PitchTracker(self.__rate, self.__analysis_size)
+		self.__analyzer.subscribe(
+			lambda spectral_frame: self.__output_spectral_results(
+				spectral_frame.mix(spectral_frame.amplitude),
+				[spectral_frame.mix(spectral_frame.db)],
+				[self.__pitch_tracker_input.update(spectral_frame)]
+			)
+		)
+
+		# Played blocks have no FFT of their own, so the output gets one
+		# analysis per analysis_size samples and reuses it for the pitch.
+		self.__analyzer_output = SpectralAnalyzer(self.__analysis_size)
+		self.__pitch_tracker_output = PitchTracker(self.__rate, self.__analysis_size)
+		self.__analyzer_output.subscribe(
+			lambda spectral_frame: self.__output_pitch(
+				self.ui.lb_pitch_output,
+				self.__pitch_tracker_output.update(spectral_frame)
+			)
+		)
+		self.__analyzed_output_block = None
+
 	def __init_frequency_slider(self):
 		self.ui.hs_frequency.setRange(self.__frequency_slider_range_min, self.__frequency_slider_range_max)
 		self.ui.hs_frequency.setSingleStep(self.__frequency_slider_single_step)
 		self.ui.hs_frequency.valueChanged.connect(self.__change_frequency_slider_coeff)
 		self.ui.hs_frequency.setValue(self.__frequency_slider_start_value)
+		self.ui.cb_preserve_duration.toggled.connect(self.__change_effect_mode)
+		self.ui.cb_monitor.setEnabled(self.__micro.live_monitor is not None)
+		if self.__micro.live_monitor is None:
+			self.ui.cb_monitor.setToolTip('Start with --live-monitor to open a full-duplex stream')
+		self.ui.cb_monitor.toggled.connect(self.__change_live_monitoring)
 
 	def __init_scene(self, graphics_view, width, height):
 		graphics_view.setFixedSize(width, height)
@@ -163,6 +250,8 @@ class VoiceChangerController(QtCore.QObject):
 			height=100
 		):
 
+		import pyqtgraph
+
 		plot_wdg = pyqtgraph.PlotWidget()
 		plot_wdg.resize(width, height)
 		plot_item = plot_wdg.getPlotItem()
@@ -174,17 +263,28 @@ class VoiceChangerController(QtCore.QObject):
 			scene.addWidget(plot_wdg)
 		return plot_wdg, plot_item
 
+	def __init_plot_curve(self, plot_item, color='w'):
+		curve = plot_item.plot(width=3, pen=color)
+		self.__plot_colors[curve] = color
+		return curve
+
 	def __init_spectrogram_image(self, plot_wdg, plot_item):
-		image_array = np.zeros((int(self.__chunk_size / 2), int(self.__chunk_size / 2)))
+		import pyqtgraph
 
-		image = pyqtgraph.ImageItem(image=image_array)
+		spectrogram_history = SpectrogramHistory(
+			self.__spectrogram_history_length,
+			int(self.__analysis_size / 2),
+			dtype=self.__spectrogram_dtype
+		)
+
+		image = pyqtgraph.ImageItem(image=spectrogram_history.view())
 		plot_wdg.addItem(image)
 
-		freqs = np.arange((self.__chunk_size / 2) + 1) / (self.__chunk_size / self.__rate)
-		scale_y = 1 / (image_array.shape[1] / freqs[-1])
+		freqs = np.arange((self.__analysis_size / 2) + 1) / (self.__analysis_size / self.__rate)
+		scale_y = 1 / (spectrogram_history.bins / freqs[-1])
 
 		tr = QtGui.QTransform() 
-		tr.scale((1 / self.__rate) * self.__chunk_size, scale_y)   
+		tr.scale((1 / self.__rate) * self.__analysis_size, scale_y)   
 		image.setTransform(tr)
 
 		cm = pyqtgraph.colormap.get('CET-L9')
@@ -194,12 +294,24 @@ class VoiceChangerController(QtCore.QObject):
 
 		plot_wdg.setLabel('left', 'Frequency', units='Hz')
 
-		win = np.hanning(self.__chunk_size)
+		return image, bar, spectrogram_history
+
 
-		return image, bar, image_array, win
+	def start(self):
+		# Plots and audio are set up once the window has been painted, so
+		# pyqtgraph and the audio devices do not hold up the first frame.
+		self.__first_paint = startup_timer.FirstPaintWatcher(self.form)
+		self.__first_paint.painted_signal.connect(self.__start_deferred)
 
+		self.__update_form()
+		sys.exit(self.app.exec_())
+
+	def __start_deferred(self):
+		startup_timer.mark('first paint')
+
+		self.__init_plot_wdgs()
+		startup_timer.mark('plots')
 
-	def start(self):	
 		self.ui.pb_record.clicked.connect(self.__pb_record_click)
 		self.ui.pb_play.clicked.connect(self.__pb_play_click)
 		self.ui.pb_play_recovered.clicked.connect(self.__pb_play_recovered_click)
@@ -214,34 +326,77 @@ class VoiceChangerController(QtCore.QObject):
 
 		self.__micro.start_input_stream()
 		self.__start_thread(self.__micro_thread)
+		self.app.aboutToQuit.connect(lambda: self.__quit_thread(self.__micro_thread))
 
-		self.__output_thread = self.__get_output_thread(
+		self.__playback_engine = self.__get_playback_engine(
 			micro=self.__micro,
-			progress_signal_handler=lambda frame: self.__output_frame_to_plot(self.__plot_item_output, frame),
-			complete_signal_handler=lambda: self.__pb_stop_click(self.__stop_play),
+			position_signal_handler=self.__handle_playback_position,
+			complete_signal_handler=lambda: self.__pb_stop_click(self.__stop_play)
+		)
+
+		self.__output_thread = self.__get_output_thread(
+			engine=self.__playback_engine,
 			error_signal_handler=self.__msgbox_message
 		)
+		self.app.aboutToQuit.connect(self.__output_thread.stop)
+
+		self.__init_playback_controls()
 
 		self.__init_frequency_slider()
 
+		self.__recovery_worker = self.__get_recovery_worker(
+			storage=self.__record_frames_fft,
+			progress_signal_handler=self.__handle_recovery_progress,
+			complete_signal_handler=self.__handle_recovery_complete,
+			error_signal_handler=self.__msgbox_message
+		)
+		self.app.aboutToQuit.connect(self.__recovery_worker.shutdown)
+
+		if self.__analysis_process:
+			self.__analysis_worker = AnalysisWorker(self.__analysis_size, self.__channels, rate=self.__rate)
+			self.__analysis_worker.start()
+			self.app.aboutToQuit.connect(self.__analysis_worker.close)
+			self.__analysis_timer = QtCore.QTimer()
+			self.__analysis_timer.timeout.connect(self.__read_analysis_results)
+			self.__analysis_timer.start(int(1000 / self.__render_fps))
+
 		self.__stopwatch = utils.get_stopwatch(
 			lambda minutes, seconds, milliseconds: 
-			self.ui.lb_record_time.setText('{}:{}:{}'.format(minutes, seconds, milliseconds))
+			self.ui.lb_record_time.setText('{}:{}:{}'.format(minutes, seconds, milliseconds)),
+			display_rate=self.__stopwatch_display_rate,
+			sample_clock=lambda: self.__micro.captured_frames,
+			rate=self.__rate
 		)
 
-		self.__update_form()
-		sys.exit(self.app.exec_())
+		self.__latency_panel = LatencyPanel(self.__latency_monitor, counters=self.__get_audio_counters)
+		self.__latency_panel_action = QtWidgets.QShortcut(
+			QtGui.QKeySequence(self.__latency_panel_shortcut),
+			self.form,
+			activated=self.__latency_panel.show
+		)
+
+		if self.__buffer_tuning:
+			self.__buffer_tuner = BufferTuner(self.__micro.chunk_size, self.__micro.ring_chunks, self.__rate)
+			self.__buffer_tuning_timer = QtCore.QTimer()
+			self.__buffer_tuning_timer.timeout.connect(self.__tune_buffers)
+			self.__buffer_tuning_timer.start(self.__buffer_tuning_interval)
+
+		startup_timer.mark('audio')
+		if self.__startup_report:
+			print(startup_timer.format_report())
 
 	def __pb_stop_click(self, callback):
 		self.ui.pb_stop.setEnabled(False)
 		callback()
 
 	def __pb_record_click(self):
-		self.__record_frames = []
-		self.__record_frames_fft = []
+		self.__recovery_worker.reset()
+		self.__record_frames.clear()
+		self.__record_frames_fft.clear()
 		self.__is_recording = True
 
 		self.ui.pb_play.setEnabled(False)
+		self.ui.pb_play_recovered.setEnabled(False)
 
 		self.ui.pb_record.setEnabled(False)
 
@@ -255,16 +410,10 @@ class VoiceChangerController(QtCore.QObject):
 
 		self.__is_recording = False
 
-		self.__quit_thread(self.__micro_thread)
-
-		for i, frame in enumerate(self.__record_frames):
-			new_recovered_frame = utils.fft_vectorized(frame)
-			new_recovered_frame = utils.ifft(new_recovered_frame).real.astype('int16')
-			self.__record_frames_fft.append(new_recovered_frame)
-
 		self.ui.pb_record.setEnabled(True)
 		self.ui.pb_play.setEnabled(True)
-		self.ui.pb_play_recovered.setEnabled(True)
+
+		self.__recovery_worker.finish()
 
 	def __pb_play_click(self):
 		self.ui.pb_record.setEnabled(False)
@@ -272,42 +421,91 @@ class VoiceChangerController(QtCore.QObject):
 		self.ui.pb_play_recovered.setEnabled(False)
 		self.ui.pb_stop.clicked.connect(lambda: self.__pb_stop_click(self.__stop_play))
 		self.ui.pb_stop.setEnabled(True)
-		self.__micro.start_output_stream()
 		self.__play_record()
 
 	def __stop_play(self):
-		self.__quit_thread(self.__output_thread)
+		self.__playback_engine.stop()
+		self.__output_thread.stop()
+		self.__set_playback_controls_enabled(False)
+		self.__analyzed_output_block = None
+		self.__render_scheduler.cancel(self.ui.lb_pitch_output.objectName())
+		self.ui.lb_pitch_output.setText('')
 		self.ui.pb_play.setEnabled(True)
-		self.ui.pb_play_recovered.setEnabled(True)
-		self.__micro.stop_output_stream()
+		self.ui.pb_play_recovered.setEnabled(self.__recovery_worker.is_complete())
 		self.ui.pb_record.setEnabled(True)
 
 	def __pb_play_recovered_click(self):
 		self.ui.pb_record.setEnabled(False)
 		self.ui.pb_play.setEnabled(False)
 		self.ui.pb_play_recovered.setEnabled(False)
-		self.ui.pb_stop.clicked.connect(lambda: self.__pb_stop_click(self.__stop_play_recovered))
+		self.ui.pb_stop.clicked.connect(lambda: self.__pb_stop_click(self.__stop_play))
 		self.ui.pb_stop.setEnabled(True)
-		self.__micro.start_output_stream()
 		self.__play_recovered_record()
 
-	def __stop_play_recovered(self):
-		self.__quit_thread(self.__output_thread)
-		self.ui.pb_play.setEnabled(True)
-		self.ui.pb_play_recovered.setEnabled(True)
-		self.__micro.stop_output_stream()
-		self.ui.pb_record.setEnabled(True)
-
 	def __play_record(self):
-		self.__output_thread.set_frames(self.__record_frames)
-		self.__start_thread(self.__output_thread)
+		self.__play_frames(self.__record_frames)
 
 	def __play_recovered_record(self):
-		self.__output_thread.set_frames(self.__record_frames_fft)
+		self.__play_frames(self.__record_frames_fft)
+
+	def __play_frames(self, frames):
+		self.__output_thread.set_frames(frames)
+		self.ui.hs_position.blockSignals(True)
+		self.ui.hs_position.setRange(0, max(len(frames) - 1, 0))
+		self.ui.hs_position.setValue(0)
+		self.ui.hs_position.blockSignals(False)
+		self.__set_playback_controls_enabled(True)
+		self.__playback_engine.start(0)
 		self.__start_thread(self.__output_thread)
 
+	def __init_playback_controls(self):
+		self.ui.hs_position.valueChanged.connect(
+			lambda value: None if self.ui.hs_position.isSliderDown() else self.__playback_engine.seek(value)
+		)
+		self.ui.hs_position.sliderReleased.connect(lambda: self.__playback_engine.seek(self.ui.hs_position.value()))
+		self.ui.pb_pause.clicked.connect(self.__pb_pause_click)
+
+	def __set_playback_controls_enabled(self, enabled):
+		self.ui.hs_position.setEnabled(enabled)
+		self.ui.pb_pause.setEnabled(enabled)
+		self.ui.pb_pause.setText('Pause')
+
+	def __pb_pause_click(self):
+		if self.__playback_engine.paused:
+			self.__playback_engine.resume()
+			self.ui.pb_pause.setText('Pause')
+		else:
+			self.__playback_engine.pause()
+			self.ui.pb_pause.setText('Resume')
+
+	def __handle_playback_position(self, index):
+		if not self.ui.hs_position.isSliderDown():
+			self.ui.hs_position.blockSignals(True)
+			self.ui.hs_position.setValue(index)
+			self.ui.hs_position.blockSignals(False)
+
+		block = self.__playback_engine.playing_block
+		if block is not None and block is not self.__analyzed_output_block:
+			self.__analyzed_output_block = block
+			self.__analyzer_output.feed(block)
+			self.__render_scheduler.submit(
+				'output',
+				self.__output_frame_to_plot,
+				self.__plot_item_output,
+				self.__curve_output,
+				block
+			)
+
 	def __handle_micro(self):
-		micro = MicroRecorder(rate=self.__rate, chunk_size=self.__chunk_size)
+		micro = MicroRecorder(
+			format_=self.__format,
+			channels=self.__channels,
+			rate=self.__rate,
+			chunk_size=self.__chunk_size,
+			monitor=self.__latency_monitor,
+			backend=self.__backend,
+			duplex=self.__live_monitoring
+		)
 		return micro
 
 	def __get_micro_thread(self, micro=None, recv_signal_handler=None, error_signal_handler=None):
@@ -325,51 +523,173 @@ class VoiceChangerController(QtCore.QObject):
 	def __quit_thread(self, thread):
 		thread.quit()
 
-	def __get_output_thread(self, micro=None, progress_signal_handler=None, complete_signal_handler=None, error_signal_handler=None):
-		output_thread = OutputThread(micro)
-		if progress_signal_handler:
-			output_thread.progress_signal.connect(progress_signal_handler)
+	def __get_playback_engine(self, micro=None, position_signal_handler=None, complete_signal_handler=None):
+		playback_engine = PlaybackEngine(micro, chunk_size=self.__chunk_size, prefetch_chunks=self.__playback_prefetch_chunks, monitor=self.__latency_monitor)
+		if position_signal_handler:
+			playback_engine.position_signal.connect(position_signal_handler)
 		if complete_signal_handler:
-			output_thread.complete_signal.connect(complete_signal_handler)
+			playback_engine.complete_signal.connect(complete_signal_handler)
+		return playback_engine
+
+	def __get_output_thread(self, engine=None, error_signal_handler=None):
+		output_thread = OutputThread(engine, monitor=self.__latency_monitor, chunk_size=self.__chunk_size, channels=self.__channels, rate=self.__rate)
 		if error_signal_handler:
 			output_thread.error_signal.connect(error_signal_handler)
 		return output_thread
 
+	def __get_recovery_worker(self, storage=None, progress_signal_handler=None, complete_signal_handler=None, error_signal_handler=None):
+		if isinstance(storage, SpectralStorage):
+			recovery_worker = RecoveryWorker(storage, transform=storage.encode)
+		else:
+			recovery_worker = RecoveryWorker(storage)
+		if progress_signal_handler:
+			recovery_worker.progress_signal.connect(progress_signal_handler)
+		if complete_signal_handler:
+			recovery_worker.complete_signal.connect(complete_signal_handler)
+		if error_signal_handler:
+			recovery_worker.error_signal.connect(error_signal_handler)
+		return recovery_worker
+
+	def __handle_recovery_progress(self, completed, submitted):
+		if not self.__is_recording and completed < submitted:
+			self.ui.pb_play_recovered.setText('Recovering {}%'.format(100 * completed // submitted))
+
+	def __handle_recovery_complete(self):
+		self.ui.pb_play_recovered.setText('Play recovered')
+		if isinstance(self.__record_frames_fft, SpectralStorage):
+			self.ui.pb_play_recovered.setToolTip('{:.1f} MiB, {:.1f}x smaller than PCM, SNR {:.1f} dB'.format(
+				self.__record_frames_fft.nbytes / 2 ** 20,
+				self.__record_frames_fft.compression_ratio,
+				self.__record_frames_fft.snr_db
+			))
+		if not self.__is_recording and self.ui.pb_record.isEnabled():
+			self.ui.pb_play_recovered.setEnabled(True)
+
 	def __change_frequency_slider_coeff(self, value):
 		self.ui.le_frequency.setText('{:.1f}'.format(value / self.__frequency_slider_coeff))
 		self.__output_thread.set_frequency_coeff(value / self.__frequency_slider_coeff)
+		if self.__micro.live_monitor:
+			self.__micro.live_monitor.set_frequency_coeff(value / self.__frequency_slider_coeff)
+
+	def __change_effect_mode(self, preserve_duration):
+		if preserve_duration:
+			self.__output_thread.set_effect_mode(OutputThread.EFFECT_PITCH_SHIFT)
+		else:
+			self.__output_thread.set_effect_mode(OutputThread.EFFECT_RESAMPLE)
+
+	def __tune_buffers(self):
+		# Retuning reopens the input, so it waits until recording and live
+		# monitoring have stopped.
+		if self.__is_recording or self.ui.cb_monitor.isChecked():
+			return
+		if self.__micro.tune(self.__buffer_tuner):
+			self.__chunk_size = self.__micro.chunk_size
+
+	def __get_audio_counters(self):
+		counters = self.__micro.xrun_counts()
+		counters['playback_underflow'] = self.__playback_engine.underflows
+		counters['chunk_size'] = self.__micro.chunk_size
+		counters['ring_chunks'] = self.__micro.ring_chunks
+		return counters
+
+	def __change_live_monitoring(self, enabled):
+		self.__micro.live_monitor.set_enabled(enabled)
+		self.ui.cb_monitor.setToolTip('Round trip {:.1f} ms'.format(self.__micro.latency * 1000) if enabled else '')
+
+	@pyqtSlot(list, float)
+	def __handle_new_frames(self, frames, capture_time=None):
+		handler_start = latency_monitor.now()
+		if capture_time is None:
+			capture_time = handler_start
+		self.__latency_monitor.record_since(LatencyMonitor.STAGE_DISPATCH, capture_time)
 
-	@pyqtSlot(list)
-	def __handle_new_frames(self, frames):
 		color = 'w'
 		if frames:
 			last_frame = frames[-1]
 			input_last_frame = last_frame.copy()
 
 			if self.__is_recording:
-				self.__record_frames += frames
+				start = len(self.__record_frames)
+				self.__record_frames.extend(frames)
+				for ind in range(start, len(self.__record_frames)):
+					self.__recovery_worker.submit(self.__record_frames[ind])
 				color = 'c'
 
-			self.__output_frame_to_plot(self.__plot_item_input, input_last_frame, color=color)
-
-			self.__output_frame_to_plot_spectrogram(self.__spectrogram, self.__spectrogram_bar, input_last_frame)
-
-			self.__output_frame_to_plot_spectrum(self.__plot_item_spectrum, input_last_frame)
+			self.__render_scheduler.submit(
+				'input',
+				self.__output_input_frame_to_plot,
+				input_last_frame,
+				color,
+				capture_time
+			)
+
+			start = latency_monitor.now()
+			for frame in frames:
+				if self.__analysis_worker:
+					self.__analysis_worker.write(frame)
+				else:
+					self.__analyzer.feed(frame)
+			self.__latency_monitor.record_since(LatencyMonitor.STAGE_ANALYSIS, start)
+
+		self.__micro.add_consumer_time(latency_monitor.now() - handler_start)
+
+	def __output_input_frame_to_plot(self, frame, color, capture_time):
+		start = latency_monitor.now()
+		self.__output_frame_to_plot(self.__plot_item_input, self.__curve_input, frame, color=color)
+		self.__latency_monitor.record_since(LatencyMonitor.STAGE_RENDER, start)
+		self.__latency_monitor.record_since(LatencyMonitor.STAGE_CAPTURE_TO_RENDER, capture_time)
+
+	def __output_frame_to_plot(self, plot_item, curve, frame, color='w'):
+		if frame.ndim > 1:
+			frame = frame.mean(axis=1)
+		frame = sample_format.to_display(frame, sample_format.FLOAT32)
+		if self.__plot_x_ends.get(plot_item) != len(frame):
+			plot_item.setXRange(self.__x_range['start'], len(frame))
+			self.__plot_x_ends[plot_item] = len(frame)
+		self.__set_curve_data(curve, frame, color)
+
+	def __set_curve_data(self, curve, y, color):
+		x, y = utils.decimate_peaks(y, self.__canvas_width_default)
+		if self.__plot_colors.get(curve) != color:
+			curve.setPen(color)
+			self.__plot_colors[curve] = color
+		curve.setData(x, y)
+
+	def __read_analysis_results(self):
+		if not self.__analysis_worker.is_alive():
+			# Fall back to analysing on the GUI thread.
+			self.__analysis_timer.stop()
+			self.__analysis_worker.close()
+			self.__analysis_worker = None
+			return
+		results = self.__analysis_worker.read()
+		if results is not None:
+			self.__output_spectral_results(*results)
+
+	def __output_spectral_results(self, magnitude, rows, pitches):
+		for row, f0 in zip(rows, pitches):
+			self.__spectrogram_history.append(row)
+			self.__pitch_history.append(f0)
+		if len(pitches):
+			self.__output_pitch(self.ui.lb_pitch_input, pitches[-1])
+		self.__render_scheduler.submit('spectrogram', self.__output_spectrogram)
+		self.__render_scheduler.submit(
+			'spectrum',
+			self.__output_frame_to_plot_spectrum,
+			self.__curve_spectrum,
+			magnitude
+		)
 
-	def __output_frame_to_plot(self, plot_item, frame, color='w'):
-		plot_item.clear()
-		frame = utils.process_frame(frame)
-		plot_item.setXRange(self.__x_range['start'], len(frame))
-		plot_item.plot(width=3, y=frame, pen=color)
+	def __output_frame_to_plot_spectrum(self, curve, magnitude, color='w'):
+		self.__set_curve_data(curve, magnitude, color)
 
-	def __output_frame_to_plot_spectrogram(self, image, bar, frame):
-		self.__image_array = utils.transform_frame_for_spectrogram(frame, self.__chunk_size, self.__win, self.__image_array)
-		image.setImage(self.__image_array)
+	def __output_spectrogram(self):
+		self.__spectrogram.setImage(self.__spectrogram_history.view())
+		self.__curve_pitch.setData(self.__pitch_history_x, self.__pitch_history.view()[:, 0])
 
-	def __output_frame_to_plot_spectrum(self, plot_item, frame, color='w'):
-		plot_item.clear()
-		amplitudes, phi_s = utils.transform_frame_for_spectrum(frame)
-		plot_item.plot(width=3, y=amplitudes, pen=color)
+	def __output_pitch(self, label, f0):
+		text = 'F0: -' if np.isnan(f0) else 'F0: {:.1f} Hz'.format(f0)
+		self.__render_scheduler.submit(label.objectName(), label.setText, text)
 
 	def __update_form(self):
 		self.form.hide()
@@ -385,7 +705,66 @@ class VoiceChangerController(QtCore.QObject):
 
 
 if __name__ == '__main__':
-	voicechanger_controller = VoiceChangerController()
+	parser = argparse.ArgumentParser(description='VoiceChanger')
+	parser.add_argument('--backend', choices=audio_backend.BACKENDS, help='audio backend (default: pyaudio, or generator with --virtual-input)')
+	parser.add_argument('--virtual-input', choices=SignalGenerator.KINDS, help='use a generated signal instead of the microphone')
+	parser.add_argument('--input-wav', help='input file for the wav backend')
+	parser.add_argument('--output-wav', help='output file for the wav backend')
+	parser.add_argument('--loop', action='store_true', help='loop the wav backend input file')
+	parser.add_argument('--rate', type=int, choices=(44100, 48000, 96000), default=44100, help='sample rate')
+	parser.add_argument('--channels', type=int, choices=(1, 2), default=1)
+	parser.add_argument('--sample-format', choices=[fmt.name for fmt in sample_format.FORMATS.values()], default='int16', help='device sample format')
+	parser.add_argument('--chunk-size', type=int, default=2048, help='frames per audio buffer; live monitoring adds two buffers to the 512-frame pitch shift, so at 44.1 kHz 128 gives a ~17 ms round trip and 256 ~23 ms')
+	parser.add_argument('--auto-buffer', action='store_true', help='grow or shrink the chunk size and ring depth at runtime from observed xruns and load')
+	parser.add_argument('--inline-analysis', action='store_true', help='run spectral analysis on the GUI thread instead of a worker process')
+	parser.add_argument('--spectral-recovery', action='store_true', help=(
+		'keep the recovered recording as pruned float16 FFT coefficients, decoded during playback; '
+		'the default pruning (-60 dB, top 256 bins of 1025) stores about 5.5x less than float32 samples '
+		'at 32-34 dB SNR on voiced/tonal input, but only about 4 dB SNR on broadband noise'
+	))
+	parser.add_argument('--spectral-top-k', type=int, default=256, help='with --spectral-recovery, keep only the K strongest bins per chunk (default 256, 0 keeps all)')
+	parser.add_argument('--spectral-threshold-db', type=float, default=-60.0, help='with --spectral-recovery, drop bins more than this many dB below the chunk peak (default -60)')
+	parser.add_argument('--spectral-no-pruning', action='store_true', help='with --spectral-recovery, keep every bin: about 2x smaller than float32 samples at ~74 dB SNR')
+	parser.add_argument('--live-monitor', action='store_true', help='open the input as a full-duplex stream so the effect can be heard live; the device must allow a second output stream for playback')
+	parser.add_argument('--startup-report', action='store_true', help='print the time spent in each startup phase')
+	parser.add_argument('--as-fast-as-possible', action='store_true', help='deliver virtual input chunks without real-time pacing')
+	args, qt_args = parser.parse_known_args()
+
+	backend_name = args.backend or (audio_backend.BACKEND_GENERATOR if args.virtual_input else audio_backend.BACKEND_PYAUDIO)
+	try:
+		backend = audio_backend.create_backend(
+			backend_name,
+			rate=args.rate,
+			realtime=not args.as_fast_as_possible,
+			signal=args.virtual_input or SignalGenerator.KIND_POLYHARMONIC,
+			input_path=args.input_wav,
+			output_path=args.output_wav,
+			loop=args.loop
+		)
+	except (OSError, EOFError, ValueError, wave.Error) as error:
+		parser.error(str(error))
+	startup_timer.mark('backend')
+
+	recovery_storage = None
+	if args.spectral_recovery:
+		if args.spectral_no_pruning:
+			recovery_storage = SpectralStorage()
+		else:
+			recovery_storage = SpectralStorage(top_k=args.spectral_top_k or None, threshold_db=args.spectral_threshold_db)
+
+	voicechanger_controller = VoiceChangerController(
+		backend=backend,
+		chunk_size=args.chunk_size,
+		rate=args.rate,
+		channels=args.channels,
+		format_=sample_format.get_format_by_name(args.sample_format),
+		auto_buffer=args.auto_buffer,
+		analysis_process=not args.inline_analysis,
+		recovery_storage=recovery_storage,
+		startup_report=args.startup_report,
+		live_monitoring=args.live_monitor,
+		argv=sys.argv[:1] + qt_args
+	)
 	voicechanger_controller.start()
 
 
@@ -40,6 +40,12 @@ class Ui_form_voicechanger(object):
         self.hs_frequency.setGeometry(QtCore.QRect(70, 660, 160, 22))
         self.hs_frequency.setOrientation(QtCore.Qt.Horizontal)
         self.hs_frequency.setObjectName("hs_frequency")
+        self.cb_preserve_duration = QtWidgets.QCheckBox(form_voicechanger)
+        self.cb_preserve_duration.setGeometry(QtCore.QRect(240, 660, 131, 22))
+        self.cb_preserve_duration.setObjectName("cb_preserve_duration")
+        self.cb_monitor = QtWidgets.QCheckBox(form_voicechanger)
+        self.cb_monitor.setGeometry(QtCore.QRect(240, 685, 131, 22))
+        self.cb_monitor.setObjectName("cb_monitor")
         self.lb_frequency = QtWidgets.QLabel(form_voicechanger)
         self.lb_frequency.setGeometry(QtCore.QRect(20, 640, 71, 16))
         self.lb_frequency.setObjectName("lb_frequency")
@@ -89,6 +95,23 @@ class Ui_form_voicechanger(object):
         self.lb_output = QtWidgets.QLabel(form_voicechanger)
         self.lb_output.setGeometry(QtCore.QRect(650, 330, 71, 16))
         self.lb_output.setObjectName("lb_output")
+        self.hs_position = QtWidgets.QSlider(form_voicechanger)
+        self.hs_position.setEnabled(False)
+        self.hs_position.setGeometry(QtCore.QRect(455, 725, 556, 22))
+        self.hs_position.setOrientation(QtCore.Qt.Horizontal)
+        self.hs_position.setObjectName("hs_position")
+        self.pb_pause = QtWidgets.QPushButton(form_voicechanger)
+        self.pb_pause.setEnabled(False)
+        self.pb_pause.setGeometry(QtCore.QRect(1020, 680, 110, 32))
+        self.pb_pause.setObjectName("pb_pause")
+        self.lb_pitch_input = QtWidgets.QLabel(form_voicechanger)
+        self.lb_pitch_input.setGeometry(QtCore.QRect(100, 15, 131, 16))
+        self.lb_pitch_input.setText("")
+        self.lb_pitch_input.setObjectName("lb_pitch_input")
+        self.lb_pitch_output = QtWidgets.QLabel(form_voicechanger)
+        self.lb_pitch_output.setGeometry(QtCore.QRect(730, 330, 131, 16))
+        self.lb_pitch_output.setText("")
+        self.lb_pitch_output.setObjectName("lb_pitch_output")
 
         self.retranslateUi(form_voicechanger)
         QtCore.QMetaObject.connectSlotsByName(form_voicechanger)
@@ -99,9 +122,12 @@ class Ui_form_voicechanger(object):
         self.lb_visualizer.setText(_translate("form_voicechanger", "Visualizer:"))
         self.pb_record.setText(_translate("form_voicechanger", "Record"))
         self.pb_play.setText(_translate("form_voicechanger", "Play"))
+        self.cb_preserve_duration.setText(_translate("form_voicechanger", "Keep duration"))
+        self.cb_monitor.setText(_translate("form_voicechanger", "Live monitor"))
         self.lb_frequency.setText(_translate("form_voicechanger", "Frequency:"))
         self.pb_stop.setText(_translate("form_voicechanger", "Stop"))
         self.pb_play_recovered.setText(_translate("form_voicechanger", "Play recovered"))
         self.lb_spectrogram.setText(_translate("form_voicechanger", "Spectrogram:"))
         self.lb_spectrum.setText(_translate("form_voicechanger", "Spectrum:"))
         self.lb_output.setText(_translate("form_voicechanger", "Output:"))
+        self.pb_pause.setText(_translate("form_voicechanger", "Pause"))